@@ -2,16 +2,19 @@
 
 from __future__ import annotations
 import os, uuid, json, base64, asyncio
-from typing import Any, Dict, Optional, List, Callable, Literal
+from typing import Any, Dict, Optional, List, Callable, Literal, TypedDict, Annotated
+from dataclasses import dataclass, field
 import re
+import orjson
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.chat_models import init_chat_model
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import AIMessage, ToolMessage, HumanMessage
+from langchain_core.messages import AIMessage, ToolMessage, HumanMessage, RemoveMessage
 
 from pydantic import BaseModel, Field, ValidationError
 
@@ -20,6 +23,11 @@ from app.core.logging import get_logger
 from langgraph.checkpoint.memory import MemorySaver
 from dotenv import load_dotenv
 
+try:
+    import pybase64 as _b64  # SIMD base64; same API as the stdlib module
+except ImportError:  # stdlib fallback
+    _b64 = base64
+
 load_dotenv()  
 checkpointer = MemorySaver()
 logger = get_logger(__name__)
@@ -53,7 +61,10 @@ graph = None
 
 
 async def _ensure_tools():
+    """Discover MCP tools once; warmed in the app lifespan, so per-connection calls hit the fast path."""
     global _mcp_client, _model_with_tools, _tools
+    if _mcp_client is not None and _model_with_tools is not None and _tools is not None:
+        return
     async with _tools_ready:
         if _mcp_client is not None and _model_with_tools is not None and _tools is not None:
             return
@@ -77,24 +88,151 @@ async def _ensure_tools():
 # -----------------------
 
 def _cel_key(base_prefix: str) -> str:
+    """Pre-sectioned single-object CEL; still read so older runs keep their history."""
     return f"{base_prefix}/CEL.md"
 
 
-def _read_cel(base_prefix: str) -> str:
-    key = _cel_key(base_prefix)
+def _cel_section_key(base_prefix: str, idx: int) -> str:
+    """CEL is stored append-only: one object per flush, ordered by index."""
+    return f"{base_prefix}/CEL/{idx:05d}.md"
+
+
+async def _s3_get(key: str) -> bytes:
+    """boto3 is blocking; run it in a worker thread so one slow S3 call doesn't stall every socket."""
+    data, _ = await asyncio.to_thread(s3c.get_bytes, key)
+    return data
+
+
+async def _s3_put_if_absent(key: str, data: bytes, content_type: str) -> bool:
+    """False if the key already exists (another writer got there first)."""
+    res = await asyncio.to_thread(s3c.put_bytes_if_absent, key=key, data=data, content_type=content_type)
+    return res is not None
+
+
+async def _s3_list_keys(prefix: str) -> List[str]:
+    keys: List[str] = []
+    token = None
+    while True:
+        resp = await asyncio.to_thread(s3c.list, prefix, 1000, token)
+        keys.extend(o["Key"] for o in resp.get("Contents", []))
+        if not resp.get("IsTruncated"):
+            return keys
+        token = resp.get("NextContinuationToken")
+
+
+async def _fetch_cel(exec_ctx: RunCtx) -> str:
+    """Stored CEL. Fetched from S3 once per connection, and again by _flush_cel when another
+    socket on the same thread has written a section in the meantime."""
+    if exec_ctx.cel_cache is not None:
+        return exec_ctx.cel_cache
+    # "<prefix>/CEL" matches both the legacy CEL.md and CEL/NNNNN.md; S3 lists keys in
+    # lexicographic order, which puts CEL.md first and the sections in index order.
+    prefix = f"{exec_ctx.base_prefix}/CEL"
     try:
-        data, _ = s3c.get_bytes(key)
-        logger.info(f"Read CEL.md from s3://{s3c.bucket}/{key}, content: {data.decode('utf-8')[:50]}...")
-        return data.decode("utf-8")
+        keys = [k for k in await _s3_list_keys(prefix) if k == _cel_key(exec_ctx.base_prefix) or k.startswith(prefix + "/")]
+        parts = await asyncio.gather(*[_s3_get(k) for k in keys])
+        exec_ctx.cel_cache = b"".join(parts).decode("utf-8")
+        exec_ctx.cel_next_idx = sum(1 for k in keys if k.startswith(prefix + "/"))
+        logger.info(f"Read CEL from s3://{s3c.bucket}/{prefix} ({len(keys)} objects), content: {exec_ctx.cel_cache[:50]}...")
+        return exec_ctx.cel_cache
     except Exception as e:
-        logger.error(f"Error reading CEL.md from s3://{s3c.bucket}/{key}: {e}")
+        logger.error(f"Error reading CEL from s3://{s3c.bucket}/{prefix}: {e}")
         return ""
 
 
-def _append_cel(base_prefix: str, content: str) -> None:
-    prev = _read_cel(base_prefix)
-    new = prev + f"\n{content.strip()}\n"
-    s3c.put_bytes(key=_cel_key(base_prefix), data=new.encode("utf-8"), content_type="text/markdown")
+async def _read_cel(exec_ctx: RunCtx) -> str:
+    """Persisted CEL plus any sections queued this turn but not yet flushed."""
+    return await _fetch_cel(exec_ctx) + "".join(exec_ctx.cel_buffer)
+
+
+def _append_cel(exec_ctx: RunCtx, content: str) -> None:
+    """Queue a CEL section; it is written to S3 by _flush_cel (once per turn)."""
+    exec_ctx.cel_buffer.append(f"\n{content.strip()}\n")
+
+
+CEL_FLUSH_ATTEMPTS = 5
+
+
+async def _flush_cel(exec_ctx: RunCtx) -> None:
+    """Write the queued sections as the next CEL object; upload cost is the new text only."""
+    buffer = exec_ctx.cel_buffer
+    if not buffer:
+        return
+    stored = await _fetch_cel(exec_ctx)
+    if exec_ctx.cel_next_idx is None:
+        # Existing sections couldn't be listed; keep the buffer rather than risk overwriting one.
+        logger.error(f"CEL index unknown for s3://{s3c.bucket}/{exec_ctx.base_prefix}; deferring flush")
+        return
+    new = "".join(buffer)
+    data = new.encode("utf-8")
+    # Conditional put: two sockets on one thread_id can hold the same next index. The loser
+    # re-lists (picking up the winner's section) and retries at the new index.
+    for _ in range(CEL_FLUSH_ATTEMPTS):
+        if await _s3_put_if_absent(_cel_section_key(exec_ctx.base_prefix, exec_ctx.cel_next_idx), data, "text/markdown"):
+            break
+        exec_ctx.cel_cache = None
+        exec_ctx.cel_next_idx = None
+        stored = await _fetch_cel(exec_ctx)
+        if exec_ctx.cel_next_idx is None:
+            logger.error(f"CEL index unknown for s3://{s3c.bucket}/{exec_ctx.base_prefix}; deferring flush")
+            return
+    else:
+        logger.error(f"CEL section write kept conflicting for s3://{s3c.bucket}/{exec_ctx.base_prefix}; deferring flush")
+        return
+    exec_ctx.cel_next_idx += 1
+    exec_ctx.cel_cache = stored + new
+    buffer.clear()
+    _maybe_refresh_cel_summary(exec_ctx)
+
+
+CEL_DIGEST_TAIL = int(os.environ.get("CEL_DIGEST_TAIL", "2048"))
+
+
+def _cel_digest(exec_ctx: RunCtx, cel: str) -> str:
+    """Bounded CEL view for clarify: rolling summary of older sections + the recent tail verbatim."""
+    if len(cel) <= CEL_DIGEST_TAIL:
+        return cel
+    return f"CEL summary: {exec_ctx.cel_summary or '(not summarised yet)'}\nRecent: {cel[-CEL_DIGEST_TAIL:]}"
+
+
+def _maybe_refresh_cel_summary(exec_ctx: RunCtx) -> None:
+    """Fold CEL text that has scrolled out of the digest tail into the summary, off the request path."""
+    cel = exec_ctx.cel_cache or ""
+    head_end = len(cel) - CEL_DIGEST_TAIL
+    if head_end - exec_ctx.cel_summary_upto < CEL_DIGEST_TAIL:
+        return
+    if exec_ctx.summary_task is not None and not exec_ctx.summary_task.done():
+        return
+
+    async def _refresh() -> None:
+        try:
+            resp = await model.ainvoke([
+                {"role": "system", "content": CEL_SUMMARY_SYSTEM},
+                {"role": "user", "content": f"Current summary:\n{exec_ctx.cel_summary}\n\nNew CEL.md sections:\n{cel[exec_ctx.cel_summary_upto:head_end]}"},
+            ])
+            exec_ctx.cel_summary = (resp.content or "").strip()
+            exec_ctx.cel_summary_upto = head_end
+        except Exception as e:
+            logger.error(f"Error refreshing CEL summary for s3://{s3c.bucket}/{exec_ctx.base_prefix}/CEL: {e}")
+
+    exec_ctx.summary_task = asyncio.create_task(_refresh())
+
+
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "4096"))
+
+
+def _trim_messages(messages: List[Any], max_tokens: int = HISTORY_MAX_TOKENS) -> List[Any]:
+    """Most recent messages that fit in ~max_tokens (4 chars/token); older turns live on in CEL.md."""
+    budget = max_tokens * 4
+    kept: List[Any] = []
+    for m in reversed(messages):
+        content = m.get("content") if isinstance(m, dict) else getattr(m, "content", m)
+        budget -= len(str(content))
+        if budget < 0 and kept:
+            break
+        kept.append(m)
+    kept.reverse()
+    return kept
 
 def     _extract_json(s: str) -> str:
     """Return the first JSON object found (handles fenced code blocks)."""
@@ -112,6 +250,8 @@ def     _extract_json(s: str) -> str:
 # -----------------------
 # 3) System prompts
 # -----------------------
+_NO_CLARIFICATION = "no_clarification_needed"
+
 CLARIFY_SYSTEM = (
     "You are a careful PM. Decide if the user's request needs clarification to proceed.\n"
     "Clarification is needed if the request is ambiguous, incomplete, or could lead to incorrect execution.\n"
@@ -122,6 +262,13 @@ CLARIFY_SYSTEM = (
 )
 
 
+CEL_SUMMARY_SYSTEM = (
+    "You maintain the running summary of a CEL.md execution log.\n"
+    "Merge the new sections into the current summary: the user's goals, decisions, clarifications, and files produced (with paths).\n"
+    "Keep it under 400 words. Output plain markdown only."
+)
+
+
 TODO_SYSTEM = (
     "You are a delivery lead.\n"
     "Summarize the user's task into a deliverable goal at the top and a concise TODO list below.\n"
@@ -205,9 +352,9 @@ RESPONDER_SYSTEM = (
 # -----------------------
 # 4) State type & emit helper
 # -----------------------
-class MCPState(dict):
+class MCPState(TypedDict, total=False):
     """Conversation + execution state passed through the graph."""
-    messages: List[dict]
+    messages: Annotated[List[Any], add_messages]   # nodes return only new messages
     step_idx: int
     max_steps: int
     done: bool
@@ -215,6 +362,20 @@ class MCPState(dict):
     need_clarification: bool
     clarifying_question: Optional[str]
     artifacts: List[dict]
+
+
+@dataclass(slots=True)
+class RunCtx:
+    """Per-connection execution context; kept out of graph state so it is never checkpointed."""
+    bucket: str
+    base_prefix: str
+    cel_buffer: List[str] = field(default_factory=list)   # CEL sections queued until _flush_cel
+    cel_cache: Optional[str] = None                       # stored CEL, concatenated
+    cel_next_idx: Optional[int] = None                    # index of the next CEL/NNNNN.md section
+    todo_task: Optional[asyncio.Task] = None              # plan speculatively started by clarify_node
+    cel_summary: str = ""                                 # rolling summary of CEL older than the digest tail
+    cel_summary_upto: int = 0                             # CEL offset already folded into cel_summary
+    summary_task: Optional[asyncio.Task] = None
     
 class Artifact(BaseModel):
     name: str
@@ -232,13 +393,13 @@ class ExecSummaryOutput(BaseModel):
 # 5) Graph nodes
 # -----------------------
 async def clarify_node(state: MCPState, config: RunnableConfig):
+    exec_ctx = None
     try:
         emit = config["configurable"]["emit"]
         thread_id = config["configurable"]["thread_id"]
         exec_ctx = config["configurable"]["exec_ctx"]
-        base_prefix = exec_ctx["base_prefix"]
         
-        emit({"event": "node", "name": "clarify"})
+        await emit({"event": "node", "name": "clarify"})
         
         if state.get("need_clarification") == False:
             # This is the first user message
@@ -254,9 +415,16 @@ async def clarify_node(state: MCPState, config: RunnableConfig):
                 """
 
 
-        cel_snip = _read_cel(base_prefix)
+        cel_snip = await _read_cel(exec_ctx)
+        # Logged either way; queued before the plan starts so the plan sees this turn's context,
+        # as todo_node's own CEL read would.
+        _append_cel(exec_ctx, message)
 
-        prompt = f"CEL.md (context):\n{cel_snip}\n\nMessages:\n{state['messages']}\n\nDo we need clarification?"
+        # Most turns need no clarification, so start planning now and drop it if we end up asking.
+        _cancel_todo(exec_ctx)
+        exec_ctx.todo_task = asyncio.create_task(model.ainvoke(_todo_prompt(await _read_cel(exec_ctx), state)))
+
+        prompt = f"CEL.md (context):\n{_cel_digest(exec_ctx, cel_snip)}\n\nMessages:\n{_trim_messages(state['messages'])}\n\nDo we need clarification?"
 
         logger.info(f"Clarify node for thread_id={thread_id} checking clarification with prompt:\n{prompt}\n--- end prompt ---\n\n")
 
@@ -266,16 +434,14 @@ async def clarify_node(state: MCPState, config: RunnableConfig):
         ]
         resp = await model.ainvoke(user_plus)
         out = (resp.content or "").strip()
-        need = out.upper() != "NO_CLARIFICATION_NEEDED"
+        # Compare only the sentinel-sized prefix; also tolerates trailing punctuation after it.
+        need = out[:len(_NO_CLARIFICATION)].lower() != _NO_CLARIFICATION
         
         logger.info(f"Clarify node for thread_id={thread_id} decided need_clarification={need} with output:\n{out}\n--- end output ---\n\n")
 
 
-        # No clarification: log and proceed
-        _append_cel(base_prefix, message)
-
-        
         if need:
+            _cancel_todo(exec_ctx)
             # Return ALL fields needed by downstream routing/node
             return {
                 "need_clarification": True,
@@ -288,28 +454,44 @@ async def clarify_node(state: MCPState, config: RunnableConfig):
             "clarifying_question": None,
         }
     except Exception as e:
+        if exec_ctx is not None:
+            _cancel_todo(exec_ctx)
         logger.exception(f"Clarify node error: {e}")
         raise
 
 
+def _todo_prompt(cel_snip: str, state: MCPState) -> List[dict]:
+    prompt = f"CEL.md (context):\n{cel_snip}\n\nMessages:\n{_trim_messages(state['messages'])}\n\nCreate a concise TODO list."
+    return [
+        {"role": "system", "content": TODO_SYSTEM},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _cancel_todo(exec_ctx: RunCtx) -> None:
+    if exec_ctx.todo_task is not None:
+        exec_ctx.todo_task.cancel()
+        exec_ctx.todo_task = None
+
+
 async def todo_node(state: MCPState, config: RunnableConfig):
     try:
         emit = config["configurable"]["emit"]
         thread_id = config["configurable"]["thread_id"]
         exec_ctx = config["configurable"]["exec_ctx"]
-        base_prefix = exec_ctx["base_prefix"]
-        emit({"event": "node", "name": "write_todos"})
-        
-        cel_snip = _read_cel(base_prefix)
+        await emit({"event": "node", "name": "write_todos"})
         
-        prompt = f"CEL.md (context):\n{cel_snip}\n\nMessages:\n{state['messages']}\n\nCreate a concise TODO list."
-        
-        logger.info(f"Todo node for thread_id={thread_id} generating todo with prompt:\n{prompt}\n--- end prompt ---\n\n")
+        task, exec_ctx.todo_task = exec_ctx.todo_task, None
+        if task is not None:
+            logger.info(f"Todo node for thread_id={thread_id} using plan started alongside clarify")
+            resp = await task
+        else:
+            cel_snip = await _read_cel(exec_ctx)
+            prompt = _todo_prompt(cel_snip, state)
 
-        resp = await model.ainvoke([
-            {"role": "system", "content": TODO_SYSTEM},
-            {"role": "user", "content": prompt}
-        ])
+            logger.info(f"Todo node for thread_id={thread_id} generating todo with prompt:\n{prompt[-1]['content']}\n--- end prompt ---\n\n")
+
+            resp = await model.ainvoke(prompt)
         todo_md = resp.content or "- [ ] Step 1\n- [ ] Step 2"
         
         logger.info(f"Todo node for thread_id={thread_id} produced todo:\n{todo_md}\n--- end todo ---\n\n")
@@ -318,7 +500,7 @@ async def todo_node(state: MCPState, config: RunnableConfig):
 {todo_md}
         """
 
-        _append_cel(base_prefix, todo_message)
+        _append_cel(exec_ctx, todo_message)
 
         return {
             "todo": todo_md,
@@ -332,17 +514,15 @@ async def execute_node(state: MCPState, config: RunnableConfig):
         emit = config["configurable"]["emit"]
         thread_id = config["configurable"]["thread_id"]
         exec_ctx = config["configurable"]["exec_ctx"]
-        base_prefix = exec_ctx["base_prefix"]
         
-        emit({"event": "node", "name": "execute", "step": state.get("step_idx", 0)})
+        await emit({"event": "node", "name": "execute", "step": state.get("step_idx", 0)})
         
-        cel_snip = _read_cel(base_prefix)
+        cel_snip = await _read_cel(exec_ctx)
         
-        all_messages = state["messages"]
-
-        tool_messages = [m for m in all_messages if isinstance(m, ToolMessage)]
+        tool_messages = [m for m in state["messages"] if isinstance(m, ToolMessage)]
         
         tool_content = []
+        new_messages: List[Any] = []
 
         # If last message is a ToolMessage, we pop it and summarize its results first
         if tool_messages:
@@ -385,7 +565,7 @@ async def execute_node(state: MCPState, config: RunnableConfig):
                 logger.warning(f"ExecSummaryOutput validation failed: {ve}")
             
             # Write only the markdown summary to CEL.md
-            _append_cel(base_prefix, f"### Step {state.get('step_idx',0)} Summary (Based on Tool Outputs):\n{summary_obj.summary}\n")
+            _append_cel(exec_ctx, f"### Step {state.get('step_idx',0)} Summary (Based on Tool Outputs):\n{summary_obj.summary}\n")
 
             # Log and keep artifacts in state for downstream tools/UI
             logger.info(
@@ -394,8 +574,8 @@ async def execute_node(state: MCPState, config: RunnableConfig):
             )
 
             # Remove verbose ToolMessages before adding the assistant summary
-            all_messages = [m for m in all_messages if not isinstance(m, ToolMessage)]
-            all_messages.append(AIMessage(content=summary_obj.summary))
+            new_messages.extend(RemoveMessage(id=m.id) for m in tool_messages)
+            new_messages.append(AIMessage(content=summary_obj.summary))
 
             # Optionally expose artifacts to the graph state for later nodes/UI
             for summary_art in summary_obj.artifacts:
@@ -417,10 +597,10 @@ async def execute_node(state: MCPState, config: RunnableConfig):
         
         logger.info(f"Execute node for thread_id={thread_id}, step_idx={state.get('step_idx',0)} got response:\n{resp}\n--- end response ---\n\n")
         
-        all_messages.append(resp)
+        new_messages.append(resp)
 
         return {
-            "messages": all_messages,
+            "messages": new_messages,
             "step_idx": state.get("step_idx", 0) + 1,
         }
     except Exception as e:
@@ -433,24 +613,23 @@ async def reply_node(state: MCPState, config: RunnableConfig):
         emit = config["configurable"]["emit"]
         thread_id = config["configurable"]["thread_id"]
         exec_ctx = config["configurable"]["exec_ctx"]
-        base_prefix = exec_ctx["base_prefix"]
-        emit({"event": "node", "name": "respond"})
+        await emit({"event": "node", "name": "respond"})
 
         # If clarification is needed, ONLY ask the question and stop here
         if state.get("need_clarification") and state.get("clarifying_question"):
             q = state["clarifying_question"]
-            emit({"event": "clarify", "question": q})
-            messages = state["messages"].append({"role": "assistant", "content": q})
+            await emit({"event": "clarify", "question": q})
+            await _flush_cel(exec_ctx)
             return {
-                "messages": messages,
+                "messages": [AIMessage(content=q)],
             }
             
-        cel_snip = _read_cel(base_prefix)
+        cel_snip = await _read_cel(exec_ctx)
 
         # Otherwise, produce the normal answer
         artifacts = state.get("artifacts", [])
         
-        prompt = f"CEL.md (context):\n{cel_snip}\n\nMessages:\n{state['messages']}\n\nArtifacts:\n{artifacts}\n\nProvide a concise answer."
+        prompt = f"CEL.md (context):\n{cel_snip}\n\nMessages:\n{_trim_messages(state['messages'])}\n\nArtifacts:\n{artifacts}\n\nProvide a concise answer."
         
         logger.info(f"Reply node for thread_id={thread_id} generating answer with prompt:\n{prompt}\n--- end prompt ---\n\n")
         
@@ -459,16 +638,16 @@ async def reply_node(state: MCPState, config: RunnableConfig):
             {"role": "user", "content": prompt}
         ])
         answer_text = resp.content or "Here is the summary of what was done."
-    
-        state["messages"].append(AIMessage(content=answer_text))
 
-        emit({"event": "answer", "text": answer_text})
+        await emit({"event": "answer", "text": answer_text})
         if artifacts:
-            emit({"event": "answer.artifacts", "items": artifacts})
+            await emit({"event": "answer.artifacts", "items": artifacts})
+
+        await _flush_cel(exec_ctx)
 
         # Now that we've answered, clear clarification flags via returned updates
         return {
-            "messages": state["messages"],
+            "messages": [AIMessage(content=answer_text)],
             "need_clarification": False,
             "clarifying_question": None,
         }
@@ -531,6 +710,26 @@ def _build_graph():
 # 7) WS helpers
 # -----------------------
 
+_SEND_QUEUE_SIZE = 256
+
+
+async def _ws_writer(ws: WebSocket, send_q: asyncio.Queue) -> None:
+    """Drain send_q into the socket in order; the only coroutine that writes to ws."""
+    closed = False
+    while True:
+        payload = await send_q.get()
+        try:
+            if not closed:
+                # Text frame (the client JSON.parses event.data); orjson is much cheaper than json.dumps.
+                await ws.send_text(orjson.dumps(payload).decode("utf-8"))
+        except Exception as e:
+            # Keep draining so producers and send_q.join() never block on a dead socket.
+            closed = True
+            logger.warning(f"WS send failed, dropping further events: {e}")
+        finally:
+            send_q.task_done()
+
+
 def _safe_filename(name: str) -> str:
     return os.path.basename(name).replace("\\", "_").replace("/", "_")
 
@@ -545,18 +744,20 @@ async def _upload_ws_files(
     """
     if not files:
         return []
-    out = []
-    for f in files:
+
+    def _upload_one(f: Dict[str, Any]) -> Dict[str, str]:
+        # Runs in a worker thread: base64 decode and the boto3 PUT both stay off the event loop.
         name = _safe_filename(f.get("name") or uuid.uuid4().hex)
         ctype = f.get("content_type") or "application/octet-stream"
         key = f"{base_prefix}/uploads/{name}"
         if f.get("b64"):
-            data = base64.b64decode(f["b64"])
+            data = _b64.b64decode(f["b64"])
         else:
             data = f.get("content", b"").encode("utf-8")
         man = s3c.put_bytes(key=key, data=data, content_type=ctype).to_dict()
-        out.append({"name": name, "uri": man["uri"], "content_type": ctype, "size": str(man["size"])})
-    return out
+        return {"name": name, "uri": man["uri"], "content_type": ctype, "size": str(man["size"])}
+
+    return list(await asyncio.gather(*[asyncio.to_thread(_upload_one, f) for f in files]))
 
 
 # -----------------------
@@ -578,20 +779,22 @@ async def ws_mcp_graph(
     """
     await ws.accept()
 
-    def emitter(payload: dict):
-        # Fire-and-forget emitter used by nodes
-        try:
-            return asyncio.create_task(ws.send_json(payload))
-        except RuntimeError:
-            # Fallback if loop not running
-            return None
+    send_q: asyncio.Queue = asyncio.Queue(maxsize=_SEND_QUEUE_SIZE)
+    writer = asyncio.create_task(_ws_writer(ws, send_q))
+
+    async def emitter(payload: dict):
+        # Nodes await this; a full queue blocks them until a slow client catches up.
+        await send_q.put(payload)
+
+    # Per-connection run id + prefix
+    tid = thread_id or uuid.uuid4().hex
+    base_prefix = f"threads/{tid}"
+    # Per-connection execution context; CEL sections queue here until flushed.
+    exec_ctx = RunCtx(bucket=DEFAULT_BUCKET, base_prefix=base_prefix)
 
     try:
         await _ensure_tools()
-        # Per-connection run id + prefix
-        tid = thread_id or uuid.uuid4().hex
-        base_prefix = f"threads/{tid}"
-        
+
         # Conversation state for this socket
         state: MCPState = MCPState(
             messages=[],
@@ -606,13 +809,13 @@ async def ws_mcp_graph(
         while True:
             raw = await ws.receive_text()
             try:
-                payload = json.loads(raw)
-            except json.JSONDecodeError:
-                await ws.send_json({"event": "error", "detail": "Malformed JSON"})
+                payload = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                await emitter({"event": "error", "detail": "Malformed JSON"})
                 continue
 
             if payload.get("type") != "user_message":
-                await ws.send_json({"event": "error", "detail": "send {type:'user_message', text: ...}"})
+                await emitter({"event": "error", "detail": "send {type:'user_message', text: ...}"})
                 continue
 
             user_text: str = (payload.get("text") or "").strip()
@@ -631,11 +834,12 @@ async def ws_mcp_graph(
                 "configurable": {
                     "thread_id": tid,
                     "emit": emitter,
-                    "exec_ctx": {"bucket": DEFAULT_BUCKET, "base_prefix": base_prefix},
+                    "exec_ctx": exec_ctx,
                 }
             }
             
-            state["messages"].append(HumanMessage(content=user_text + files_note))
+            # History lives in the checkpointer; only the new message is sent, add_messages appends it.
+            state["messages"] = [HumanMessage(content=user_text + files_note)]
             
             result = await graph.ainvoke(state, config=config)
 
@@ -646,6 +850,19 @@ async def ws_mcp_graph(
     except Exception as e:
         logger.exception("WebSocket error: %s", e)
         try:
-            await ws.send_json({"event": "error", "detail": str(e)})
+            await emitter({"event": "error", "detail": str(e)})
+            await asyncio.wait_for(send_q.join(), timeout=5)
+        except Exception:
+            pass
         finally:
-            await ws.close()
\ No newline at end of file
+            await ws.close()
+    finally:
+        writer.cancel()
+        _cancel_todo(exec_ctx)
+        # Persist anything queued by a turn that never reached reply_node.
+        try:
+            await _flush_cel(exec_ctx)
+        except Exception as e:
+            logger.error(f"Error flushing CEL.md for thread_id={tid}: {e}")
+        if exec_ctx.summary_task is not None:
+            exec_ctx.summary_task.cancel()
\ No newline at end of file
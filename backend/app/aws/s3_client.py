@@ -1,14 +1,49 @@
 # app/aws/s3_client.py
 from __future__ import annotations
 
+import base64
+import contextlib
 import hashlib
+import io
 import json
 import mimetypes
+import mmap
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads = orjson.loads
+except ImportError:  # stdlib fallback
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _json_loads(data: bytes) -> Any:
+        return json.loads(data.decode("utf-8"))
+
+try:
+    import blake3
+except ImportError:  # optional; only needed for put_file(hash_algo="blake3")
+    blake3 = None
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed for put_json(compress="zstd") and reading such objects
+    zstandard = None
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from s3transfer.manager import TransferManager
+from botocore.auth import S3SigV4QueryAuth
+from botocore.awsrequest import AWSRequest
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
@@ -16,6 +51,99 @@ from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# OpenSSL-backed prototype; .copy() clones the initialised context instead of re-fetching the digest per call.
+_SHA256 = hashlib.new("sha256")
+_HASH_BUFSIZE = 4 * 1024 * 1024
+# Most list_objects_v2 pages exists_many reads before HEADing the remaining keys
+_EXISTS_MAX_PAGES = 4
+
+mimetypes.init()
+# Snapshot of the (system + stdlib) extension table, lower-cased, so the common case is one dict lookup.
+_EXT_TO_MIME: Dict[str, str] = {ext.lower(): mime for ext, mime in mimetypes.types_map.items()}
+
+# Multipart above 8 MiB in 16 MiB parts with wide concurrency; default is 10 threads x 8 MiB.
+# max_pool_connections (128 default) stays above max_concurrency so parts never wait on a socket.
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=min(32, (os.cpu_count() or 4) * 4),
+    io_chunksize=2 * 1024 * 1024,
+    use_threads=True,
+)
+
+# boto3 clients are thread-safe and costly to build (credential resolution, endpoint setup,
+# TLS pool), so S3Client instances with the same settings share one.
+_CLIENTS: Dict[Tuple, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _fingerprint(secret: str | None) -> str | None:
+    # Cache keys hold a digest, never the credential itself.
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest() if secret else None
+
+
+def _get_client(
+    region_name: str | None,
+    aws_access_key_id: str | None,
+    aws_secret_access_key: str | None,
+    aws_session_token: str | None,
+    max_pool_connections: int,
+    signature_version: str,
+):
+    cache_key = (
+        region_name,
+        _fingerprint(aws_access_key_id),
+        _fingerprint(aws_secret_access_key),
+        _fingerprint(aws_session_token),
+        max_pool_connections,
+        signature_version,
+    )
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(cache_key)
+        if client is None:
+            client = _CLIENTS[cache_key] = boto3.client(
+                "s3",
+                region_name=region_name,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                aws_session_token=aws_session_token,
+                config=Config(
+                    s3={"addressing_style": "virtual"},
+                    signature_version=signature_version,
+                    retries={"max_attempts": 8, "mode": "standard"},
+                    max_pool_connections=max_pool_connections,
+                ),
+            )
+        return client
+
+
+class _HashingReader(io.RawIOBase):
+    """Read-only file wrapper that feeds every byte read into a SHA256, so upload and hash share one pass.
+
+    Deliberately non-seekable: boto3 then reads it strictly in order (parts are still sent
+    concurrently), which keeps the digest correct.
+    """
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb", buffering=0)
+        self._h = _SHA256.copy()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._f.readinto(b)
+        if n:
+            self._h.update(memoryview(b)[:n])
+        return n
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
 
 @dataclass
 class S3Manifest:
@@ -51,24 +179,39 @@ class S3Client:
         aws_access_key_id: str | None = None,
         aws_secret_access_key: str | None = None,
         aws_session_token: str | None = None,
-        max_pool_connections: int = 50,
+        max_pool_connections: int = 128,
         signature_version: str = "s3v4",
+        use_crt: bool = False,
+        base_metadata: Dict[str, str] | None = None,
     ):
+        """
+        use_crt: route put_file/download_file through the AWS Common Runtime transfer client
+        (native, multiplexed, adaptive part concurrency). Needs boto3[crt]; falls back to the
+        classic transfer manager when it isn't installed or isn't compatible.
+
+        base_metadata: metadata stamped on every put_bytes/put_file upload; per-call metadata
+        is layered on top of it.
+        """
         self.bucket = bucket_name
-        self.s3 = boto3.client(
-            "s3",
-            region_name=region_name,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            aws_session_token=aws_session_token,
-            config=Config(
-                s3={"addressing_style": "virtual"},
-                signature_version=signature_version,
-                retries={"max_attempts": 8, "mode": "standard"},
-                max_pool_connections=max_pool_connections,
-            ),
+        self.s3 = _get_client(
+            region_name,
+            aws_access_key_id,
+            aws_secret_access_key,
+            aws_session_token,
+            max_pool_connections,
+            signature_version,
         )
         self._region = region_name
+        self._base_metadata: Dict[str, str] = dict(base_metadata or {})
+        self._crt = None
+        if use_crt:
+            try:
+                from boto3.crt import create_crt_transfer_manager
+                self._crt = create_crt_transfer_manager(self.s3, _TRANSFER_CONFIG)
+            except ImportError:
+                pass
+            if self._crt is None:
+                logger.warning("AWS CRT transfer client unavailable; using classic boto3 transfers")
         logger.info(f"S3Client initialized for bucket '{bucket_name}'")
 
     # ---------------------------
@@ -76,20 +219,81 @@ class S3Client:
     # ---------------------------
     @staticmethod
     def _guess_mime(path_or_name: str, fallback: str = "application/octet-stream") -> str:
-        ctype, _ = mimetypes.guess_type(path_or_name)
+        ctype = _EXT_TO_MIME.get(os.path.splitext(path_or_name)[1].lower())
+        if ctype is None:
+            # Compound/encoded names (e.g. .tar.gz) still get mimetypes' full handling.
+            ctype, _ = mimetypes.guess_type(path_or_name)
         return ctype or fallback
 
     @staticmethod
-    def _sha256_file(path: str, bufsize: int = 1024 * 1024) -> str:
-        h = hashlib.sha256()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(bufsize), b""):
-                h.update(chunk)
+    def _sha256_file(path: str, bufsize: int = _HASH_BUFSIZE) -> str:
+        h = _SHA256.copy()
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:  # mmap can't map an empty file
+                return h.hexdigest()
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # Hash straight out of the page cache: no read() copies into Python buffers.
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                mv = memoryview(mm)
+                try:
+                    for off in range(0, size, bufsize):
+                        h.update(mv[off:off + bufsize])
+                finally:
+                    mv.release()
+        finally:
+            os.close(fd)
+        return h.hexdigest()
+
+    @staticmethod
+    def _blake3_file(path: str) -> str:
+        if blake3 is None:
+            raise RuntimeError("hash_algo='blake3' requires the 'blake3' package")
+        # update_mmap maps the file itself and hashes it across all cores.
+        h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        h.update_mmap(path)
         return h.hexdigest()
 
     @staticmethod
     def _sha256_bytes(b: bytes) -> str:
-        return hashlib.sha256(b).hexdigest()
+        h = _SHA256.copy()
+        h.update(b)
+        return h.hexdigest()
+
+    @staticmethod
+    def _extra_args(
+        content_type: str,
+        metadata: Dict[str, str],
+        cache_control: str | None,
+        acl: str | None,
+        sse: str | None,
+        kms_key_id: str | None,
+    ) -> Dict[str, Any]:
+        """Shared put_object/upload_file argument builder; the usual no-options call is a single literal."""
+        if not (cache_control or acl or sse or kms_key_id):
+            return {"ContentType": content_type, "Metadata": metadata}
+        extra: Dict[str, Any] = {"ContentType": content_type, "Metadata": metadata}
+        if cache_control:
+            extra["CacheControl"] = cache_control
+        if acl:
+            extra["ACL"] = acl
+        if sse:
+            extra["ServerSideEncryption"] = sse
+        if kms_key_id:
+            extra["SSEKMSKeyId"] = kms_key_id
+        return extra
+
+    def _metadata(self, metadata: Dict[str, str] | None, hash_key: str | None = None, digest: str | None = None) -> Dict[str, str]:
+        """Fresh metadata dict: base, then caller's, then the content hash. copy()+update avoids the
+        intermediate dicts of chained `|`, and the caller's dict is never mutated."""
+        meta = self._base_metadata.copy()
+        if metadata:
+            meta.update(metadata)
+        if digest:
+            meta[hash_key] = digest
+        return meta
 
     def _uri(self, key: str) -> str:
         return f"s3://{self.bucket}/{key}"
@@ -117,10 +321,12 @@ class S3Client:
     # ---------------------------
     # Core object operations
     # ---------------------------
-    def head_object(self, key: str, version_id: str | None = None) -> Dict[str, Any]:
+    def head_object(self, key: str, version_id: str | None = None, checksum_mode: bool = False) -> Dict[str, Any]:
         kwargs = {"Bucket": self.bucket, "Key": key}
         if version_id:
             kwargs["VersionId"] = version_id
+        if checksum_mode:
+            kwargs["ChecksumMode"] = "ENABLED"
         return self.s3.head_object(**kwargs)
 
     def exists(self, key: str, version_id: str | None = None) -> bool:
@@ -132,6 +338,46 @@ class S3Client:
                 return False
             raise
 
+    def exists_many(self, keys: List[str]) -> Dict[str, bool]:
+        """Membership for many keys. Keys sharing a prefix are answered from list_objects_v2 pages
+        (up to 1000 keys per round trip) instead of one HEAD each; the listing starts just before
+        the smallest key and stops once it passes the largest. The listing is capped at
+        _EXISTS_MAX_PAGES, so sparse keys over a wide range don't page through everything between
+        them: keys past the last listed one, and keys with no common prefix, fall back to
+        concurrent exists() calls."""
+        if not keys:
+            return {}
+        lo, hi = min(keys), max(keys)
+        prefix = os.path.commonprefix([lo, hi])
+        if not prefix or len(keys) == 1:
+            return self._exists_concurrent(keys)
+
+        seen = set()
+        last = None
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix, "StartAfter": lo[:-1]}
+        pages = self.s3.get_paginator("list_objects_v2").paginate(**kwargs)
+        for n, page in enumerate(pages, 1):
+            contents = page.get("Contents", [])
+            seen.update(obj["Key"] for obj in contents)
+            if not page.get("IsTruncated"):
+                last = None  # listing exhausted: every key is answered
+                break
+            last = contents[-1]["Key"] if contents else last
+            if last is not None and last >= hi:
+                break
+            if n >= _EXISTS_MAX_PAGES:
+                break
+        out = {k: k in seen for k in keys}
+        rest = [k for k in keys if last is not None and k > last]
+        if rest:
+            out.update(self._exists_concurrent(rest))
+        return out
+
+    def _exists_concurrent(self, keys: List[str]) -> Dict[str, bool]:
+        workers = min(len(keys), self.s3.meta.config.max_pool_connections or 10)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(keys, pool.map(self.exists, keys)))
+
     def list(self, prefix: str, limit: int = 1000, continuation_token: str | None = None) -> Dict[str, Any]:
         kwargs = {
             "Bucket": self.bucket,
@@ -155,23 +401,60 @@ class S3Client:
         acl: str | None = None,
         sse: str | None = None,  # e.g., 'AES256' or 'aws:kms'
         kms_key_id: str | None = None,
+        verify: bool = False,
+        content_encoding: str | None = None,
+        if_none_match: bool = False,
+        hash_algo: str = "sha256",
     ) -> S3Manifest:
+        """
+        The manifest is built from the PutObject response plus what we just sent (size, type,
+        metadata), saving a HEAD round trip. verify=True re-reads it from S3 with head_object.
+
+        hash_algo: "sha256" (default) records a content hash in metadata and the manifest.
+        "md5" sends only Content-MD5, which S3 validates on receipt; "none" skips hashing. Both
+        leave manifest.sha256 as None, so use them only where nothing dedups on the sha256.
+        """
+        if hash_algo not in ("sha256", "md5", "none"):
+            raise ValueError(f"Unsupported hash_algo: {hash_algo!r}")
         if content_type is None:
             content_type = "application/octet-stream"
-        sha = self._sha256_bytes(data)
-        extra: Dict[str, Any] = {"ContentType": content_type, "Metadata": (metadata or {}) | {"sha256": sha}}
-        if cache_control:
-            extra["CacheControl"] = cache_control
-        if acl:
-            extra["ACL"] = acl
-        if sse:
-            extra["ServerSideEncryption"] = sse
-        if kms_key_id:
-            extra["SSEKMSKeyId"] = kms_key_id
+        sha = self._sha256_bytes(data) if hash_algo == "sha256" else None
+        meta = self._metadata(metadata, "sha256", sha)
+        extra = self._extra_args(content_type, meta, cache_control, acl, sse, kms_key_id)
+        if hash_algo == "md5":
+            extra["ContentMD5"] = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+        if content_encoding:
+            extra["ContentEncoding"] = content_encoding
+        if if_none_match:
+            extra["IfNoneMatch"] = "*"
 
         resp = self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
-        head = self.head_object(key, resp.get("VersionId"))
-        return self._manifest_from_head(key, head, override_sha=sha)
+        if verify:
+            head = self.head_object(key, resp.get("VersionId"))
+            return self._manifest_from_head(key, head, override_sha=sha)
+        return S3Manifest(
+            bucket=self.bucket,
+            key=key,
+            uri=self._uri(key),
+            size=len(data),
+            etag=resp.get("ETag", "").strip('"'),
+            version_id=resp.get("VersionId"),
+            content_type=content_type,
+            sha256=sha,
+            metadata=meta,
+        )
+
+    def put_bytes_if_absent(self, key: str, data: bytes, **kwargs) -> Optional[S3Manifest]:
+        """Conditional write (If-None-Match: *): returns None if the key already exists.
+
+        Replaces an exists() + put_bytes() pair with one round trip, and is race-free.
+        """
+        try:
+            return self.put_bytes(key, data, if_none_match=True, **kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+                return None
+            raise
 
     def put_file(
         self,
@@ -184,32 +467,76 @@ class S3Client:
         sse: str | None = None,
         kms_key_id: str | None = None,
         compute_sha256: bool = True,
+        use_s3_checksum: bool = False,
+        fused_sha256: bool = False,
+        hash_algo: str = "sha256",
+        max_concurrency: int | None = None,
     ) -> S3Manifest:
+        """
+        Files above 8 MiB go up as multipart in 16 MiB parts. max_concurrency caps the part
+        threads for this call (default min(32, 4 x CPUs)); set it lower when several put_file
+        calls run side by side so they don't oversubscribe the connection pool.
+
+        hash_algo="blake3": integrity hash with BLAKE3 (SIMD, multi-core) instead of SHA256. The
+        digest is stored as metadata["blake3"]; manifest.sha256 is then None.
+
+        use_s3_checksum: skip the local hashing pass and have S3 compute SHA256 during the upload.
+        The manifest gets the hex digest for single-part uploads; multipart uploads only have
+        S3's composite (per-part) checksum, which is kept in metadata["s3_checksum_sha256"].
+
+        fused_sha256: hash while uploading instead of in a separate pass over the file. The digest
+        only exists once the upload finishes, so it is returned in the manifest but not stored
+        as S3 object metadata.
+        """
         if content_type is None:
             content_type = self._guess_mime(local_path)
-        sha = self._sha256_file(local_path) if compute_sha256 else None
-
-        extra_args: Dict[str, Any] = {"ContentType": content_type, "Metadata": metadata or {}}
-        if sha:
-            extra_args["Metadata"]["sha256"] = sha
-        if cache_control:
-            extra_args["CacheControl"] = cache_control
-        if acl:
-            extra_args["ACL"] = acl
-        if sse:
-            extra_args["ServerSideEncryption"] = sse
-        if kms_key_id:
-            extra_args["SSEKMSKeyId"] = kms_key_id
+        if hash_algo not in ("sha256", "blake3"):
+            raise ValueError(f"Unsupported hash_algo: {hash_algo}")
+        if hash_algo == "blake3":
+            fused = use_s3_checksum = False
+            sha = None
+            meta = self._metadata(metadata, "blake3", self._blake3_file(local_path) if compute_sha256 else None)
+        else:
+            fused = fused_sha256 and compute_sha256 and not use_s3_checksum
+            sha = self._sha256_file(local_path) if compute_sha256 and not use_s3_checksum and not fused else None
+            meta = self._metadata(metadata, "sha256", sha)
+        extra_args = self._extra_args(content_type, meta, cache_control, acl, sse, kms_key_id)
+        if use_s3_checksum:
+            extra_args["ChecksumAlgorithm"] = "SHA256"
+
+        config = _TRANSFER_CONFIG
+        if max_concurrency is not None:
+            config = TransferConfig(
+                multipart_threshold=_TRANSFER_CONFIG.multipart_threshold,
+                multipart_chunksize=_TRANSFER_CONFIG.multipart_chunksize,
+                max_concurrency=max_concurrency,
+            )
 
         # upload_file handles multipart automatically
-        self.s3.upload_file(local_path, self.bucket, key, ExtraArgs=extra_args)
-        head = self.head_object(key)
-        return self._manifest_from_head(key, head, override_sha=sha)
+        if fused:
+            with _HashingReader(local_path) as reader:
+                self.s3.upload_fileobj(reader, self.bucket, key, ExtraArgs=extra_args, Config=config)
+            sha = reader.hexdigest()
+        else:
+            if self._crt is not None:
+                self._crt.upload(local_path, self.bucket, key, extra_args).result()
+            else:
+                self.s3.upload_file(local_path, self.bucket, key, ExtraArgs=extra_args, Config=config)
+        head = self.head_object(key, checksum_mode=use_s3_checksum)
+        manifest = self._manifest_from_head(key, head, override_sha=sha)
+        if use_s3_checksum and head.get("ChecksumSHA256"):
+            s3_sum = head["ChecksumSHA256"]
+            if "-" in s3_sum:
+                manifest.metadata["s3_checksum_sha256"] = s3_sum
+            else:
+                manifest.sha256 = base64.b64decode(s3_sum).hex()
+        return manifest
 
     # ---------------------------
     # Downloads
     # ---------------------------
     def get_bytes(self, key: str, version_id: str | None = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Object body as bytes. With a Content-Length, http.client reads it into one allocation."""
         kwargs = {"Bucket": self.bucket, "Key": key}
         if version_id:
             kwargs["VersionId"] = version_id
@@ -217,16 +544,103 @@ class S3Client:
         data = obj["Body"].read()
         return data, obj
 
+    def get_bytes_parallel(
+        self,
+        key: str,
+        version_id: str | None = None,
+        part_size: int = 16 * 1024 * 1024,
+        max_concurrency: int = 16,
+    ) -> bytearray:
+        """Fetch a large object with concurrent ranged GETs written into one preallocated buffer.
+
+        Objects no larger than one part fall back to a single get_bytes.
+        """
+        head = self.head_object(key, version_id)
+        size = head.get("ContentLength", 0)
+        if size <= part_size:
+            data, _ = self.get_bytes(key, version_id)
+            return bytearray(data)
+
+        buf = bytearray(size)
+        view = memoryview(buf)
+        # Pin the version we sized against so every range reads the same object.
+        pinned = version_id or head.get("VersionId")
+
+        def _fetch(off: int) -> None:
+            end = min(off + part_size, size)
+            kwargs = {"Bucket": self.bucket, "Key": key, "Range": f"bytes={off}-{end - 1}"}
+            if pinned:
+                kwargs["VersionId"] = pinned
+            body = self.s3.get_object(**kwargs)["Body"]
+            pos = off
+            for chunk in body.iter_chunks(1024 * 1024):
+                view[pos:pos + len(chunk)] = chunk
+                pos += len(chunk)
+            if pos != end:
+                raise IOError(f"Short read on s3://{self.bucket}/{key}: got bytes {off}-{pos}, expected up to {end}")
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            list(pool.map(_fetch, range(0, size, part_size)))
+        return buf
+
     def download_file(self, key: str, local_path: str, version_id: str | None = None) -> None:
         os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
         extra = {}
         if version_id:
             extra["VersionId"] = version_id
-        self.s3.download_file(self.bucket, key, local_path, ExtraArgs=extra or None)
+        if self._crt is not None:
+            self._crt.download(self.bucket, key, local_path, extra).result()
+            return
+        self.s3.download_file(self.bucket, key, local_path, ExtraArgs=extra or None, Config=_TRANSFER_CONFIG)
+
+    def download_many(self, pairs: List[Tuple[str, str]]) -> List[Optional[BaseException]]:
+        """Download (key, local_path) pairs through one transfer manager: every object is queued at
+        once and large ones are split into concurrent ranged GETs. Returns one entry per pair,
+        None on success or the exception that transfer raised."""
+        for d in {os.path.dirname(local_path) or "." for _, local_path in pairs}:
+            os.makedirs(d, exist_ok=True)
+        for _, local_path in pairs:
+            # Downloading over an existing file is several times slower than into a fresh one.
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(local_path)
+        errors: List[Optional[BaseException]] = []
+        if self._crt is not None:
+            futures = [self._crt.download(self.bucket, key, str(local), {}) for key, local in pairs]
+            for fut in futures:
+                try:
+                    fut.result()
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+            return errors
+        with TransferManager(self.s3, config=_TRANSFER_CONFIG) as tm:
+            futures = [tm.download(self.bucket, key, str(local)) for key, local in pairs]
+            for fut in futures:
+                try:
+                    fut.result()
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+        return errors
 
     # ---------------------------
     # Presigned URLs
     # ---------------------------
+    def _presign_local(self, key: str, query: Dict[str, str], expires_in: int) -> Optional[str]:
+        """SigV4 query-sign a GET directly, skipping generate_presigned_url's operation-model and
+        endpoint resolution. Only for the plain AWS virtual-host case; None means use boto."""
+        if not self._region or "." in self.bucket or self.s3.meta.endpoint_url != f"https://s3.{self._region}.amazonaws.com":
+            return None
+        creds = self.s3._get_credentials()
+        if creds is None:
+            return None
+        url = f"https://{self.bucket}.s3.{self._region}.amazonaws.com/{quote(key, safe='/~')}"
+        if query:
+            url += "?" + urlencode(query, quote_via=quote)
+        req = AWSRequest(method="GET", url=url)
+        S3SigV4QueryAuth(creds.get_frozen_credentials(), "s3", self._region, expires=expires_in).add_auth(req)
+        return req.prepare().url
+
     def presigned_get(
         self,
         key: str,
@@ -242,7 +656,20 @@ class S3Client:
             params["ResponseContentType"] = response_content_type
         if response_content_disposition:
             params["ResponseContentDisposition"] = response_content_disposition
-        return self.s3.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_in)
+
+        query: Dict[str, str] = {}
+        if version_id:
+            query["versionId"] = version_id
+        if response_content_type:
+            query["response-content-type"] = response_content_type
+        if response_content_disposition:
+            query["response-content-disposition"] = response_content_disposition
+        try:
+            url = self._presign_local(key, query, expires_in)
+        except Exception as e:
+            logger.warning(f"Local presign failed for s3://{self.bucket}/{key}, using boto: {e}")
+            url = None
+        return url or self.s3.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_in)
 
     def presigned_put(
         self,
@@ -292,22 +719,33 @@ class S3Client:
             kwargs["VersionId"] = version_id
         return self.s3.delete_object(**kwargs)
 
-    def delete_prefix(self, prefix: str) -> int:
-        """Delete up to 1000 objects per batch under a prefix. Returns count deleted."""
-        deleted = 0
+    def delete_prefix(self, prefix: str, max_workers: int = 16) -> int:
+        """Delete everything under a prefix, 1000 keys per batch. Returns count deleted.
+
+        Listing stays sequential (continuation tokens), but each page's delete_objects is handed
+        to a pool so the next page is listed while up to max_workers batches are in flight.
+        """
+        def _delete(batch: list) -> int:
+            out = self.s3.delete_objects(Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True})
+            # Quiet mode only reports failures.
+            errors = out.get("Errors", [])
+            for err in errors:
+                logger.error(f"Failed to delete s3://{self.bucket}/{err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+            return len(batch) - len(errors)
+
+        futures = []
         token = None
-        while True:
-            resp = self.list(prefix, limit=1000, continuation_token=token)
-            contents = resp.get("Contents", [])
-            if not contents:
-                break
-            to_delete = [{"Key": c["Key"]} for c in contents]
-            out = self.s3.delete_objects(Bucket=self.bucket, Delete={"Objects": to_delete, "Quiet": True})
-            deleted += len(out.get("Deleted", []))
-            token = resp.get("NextContinuationToken")
-            if not token:
-                break
-        return deleted
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while True:
+                resp = self.list(prefix, limit=1000, continuation_token=token)
+                contents = resp.get("Contents", [])
+                if not contents:
+                    break
+                futures.append(pool.submit(_delete, [{"Key": c["Key"]} for c in contents]))
+                token = resp.get("NextContinuationToken")
+                if not token:
+                    break
+        return sum(f.result() for f in futures)
 
     # ---------------------------
     # Manifests
@@ -334,10 +772,22 @@ class S3Client:
     # ---------------------------
     # Convenience: JSON helpers
     # ---------------------------
-    def put_json(self, key: str, obj: Any, **kwargs) -> S3Manifest:
-        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    def put_json(self, key: str, obj: Any, compress: str | None = None, **kwargs) -> S3Manifest:
+        """compress="zstd" stores the JSON zstd-compressed with Content-Encoding: zstd."""
+        data = _json_dumps(obj)
+        if compress == "zstd":
+            if zstandard is None:
+                raise RuntimeError("put_json(compress='zstd') requires the 'zstandard' package")
+            data = zstandard.ZstdCompressor(level=3, threads=-1).compress(data)
+            kwargs["content_encoding"] = "zstd"
+        elif compress is not None:
+            raise ValueError(f"Unsupported compression: {compress}")
         return self.put_bytes(key, data, content_type="application/json", **kwargs)
 
     def get_json(self, key: str, version_id: str | None = None) -> Any:
-        data, _ = self.get_bytes(key, version_id)
-        return json.loads(data.decode("utf-8"))
+        data, obj = self.get_bytes(key, version_id)
+        if obj.get("ContentEncoding") == "zstd":
+            if zstandard is None:
+                raise RuntimeError(f"s3://{self.bucket}/{key} is zstd-encoded; install 'zstandard' to read it")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return _json_loads(data)
@@ -35,6 +35,7 @@ import sys
 import textwrap
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from app.core.logging import get_logger
@@ -42,6 +43,28 @@ from app.utils.sanitization.code_extracters import _extract_python
 
 logger = get_logger(__name__)
 
+_EVAL_MARKER = "**Evaluation (by Evaluator):**"
+_HASH_CHUNK = 1024 * 1024
+_HASH_WORKERS = min(8, os.cpu_count() or 4)
+
+
+def _hash_file(path: pathlib.Path) -> Tuple[int, str]:
+    """Stream a file through sha256. Returns (size, hexdigest)."""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return size, h.hexdigest()
+
+
+def _clip(text: Optional[str], limit: int) -> str:
+    """Return at most *limit* chars of text, marking truncation with an ellipsis."""
+    if not text:
+        return ""
+    return text if len(text) <= limit else text[:limit] + "…"
+
 # --------------------------- Public Interfaces --------------------------------
 
 class LLMClient:
@@ -139,6 +162,8 @@ class CodeSandbox:
         self.base_tmp = pathlib.Path(base_tmp_dir).resolve()
         self.base_tmp.mkdir(parents=True, exist_ok=True)
         self._kernels: Dict[str, Kernel] = {}
+        # run_id -> byte offset just past the last evaluation marker in CEL.md
+        self._cel_marker_offset: Dict[str, int] = {}
 
     # ---------- Kernel/session management ----------
     def _run_dir(self, run_id: str) -> pathlib.Path:
@@ -168,22 +193,27 @@ class CodeSandbox:
         return self._run_dir(run_id) / "CEL.md"
 
     def _artifact_index(self, run_dir: pathlib.Path) -> List[Dict[str, Any]]:
-        artifacts: List[Dict[str, Any]] = []
-        for p in run_dir.rglob("*"):
-            if not p.is_file():
-                continue
+        files = [p for p in run_dir.rglob("*") if p.is_file()]
+
+        def _hash_one(p: pathlib.Path) -> Optional[Dict[str, Any]]:
             try:
-                data = p.read_bytes()
+                size, digest = _hash_file(p)
             except Exception:
-                continue
-            rel = p.relative_to(run_dir)
-            artifacts.append({
+                return None
+            return {
                 "name": p.name,
-                "path": str(rel),
-                "size": len(data),
-                "sha256": hashlib.sha256(data).hexdigest()[:12],
-            })
-        return artifacts
+                "path": str(p.relative_to(run_dir)),
+                "size": size,
+                "sha256": digest[:12],
+            }
+
+        # hashlib releases the GIL on large buffers, so threads overlap read + hash across files.
+        if len(files) > 1:
+            with ThreadPoolExecutor(max_workers=_HASH_WORKERS) as ex:
+                results = list(ex.map(_hash_one, files))
+        else:
+            results = [_hash_one(p) for p in files]
+        return [a for a in results if a is not None]
 
     def _append_cel_step(
         self,
@@ -210,11 +240,14 @@ class CodeSandbox:
 {art_lines}
 
 **Next steps:**
-**Evaluation (by Evaluator):** {evaluation_line}
+{_EVAL_MARKER} {evaluation_line}
 """
         header = "# Context Engineering Log (CEL)\n\n"
-        prev = cel.read_text() if cel.exists() else header
-        cel.write_text(prev + block)
+        prev = cel.read_text(encoding="utf-8") if cel.exists() else header
+        cel.write_text(prev + block, encoding="utf-8")
+        # The marker line is always the last line of the block; remember where it ends.
+        tail = f" {evaluation_line}\n".encode("utf-8")
+        self._cel_marker_offset[run_id] = cel.stat().st_size - len(tail)
 
     @staticmethod
     def _extract_json_blob(text: str) -> dict:
@@ -224,23 +257,38 @@ class CodeSandbox:
         return json.loads(text[s:e+1])
 
     def _update_last_eval_block(self, run_id: str, verdict: str, eval_text: str, output_summary: str) -> None:
-        """Replace last '**Evaluation (by Evaluator):' with a structured block."""
+        """Replace the text after the last evaluation marker with a structured block."""
         cel = self.cel_path(run_id)
-        text = cel.read_text() if cel.exists() else ""
+        block = (
+            f" {verdict}\n"
+            f"**Eval:** {eval_text}\n"
+            f"**Output summary:** {output_summary}\n"
+        )
+        marker = _EVAL_MARKER.encode("utf-8")
+        offset = self._cel_marker_offset.get(run_id)
+        if offset is not None and offset >= len(marker) and cel.exists():
+            # Fast path: splice in place at the offset recorded by _append_cel_step.
+            with open(cel, "r+b") as f:
+                f.seek(offset - len(marker))
+                if f.read(len(marker)) == marker:
+                    _, _, remainder = f.read().partition(b"\n")
+                    f.seek(offset)
+                    f.write(block.encode("utf-8") + remainder)
+                    f.truncate()
+                    return
+
+        text = cel.read_text(encoding="utf-8") if cel.exists() else ""
         if not text:
             return
-        parts = text.rsplit("**Evaluation (by Evaluator):**", 1)
+        parts = text.rsplit(_EVAL_MARKER, 1)
         if len(parts) != 2:
             return
         prefix, tail = parts
         tail_split = tail.split("\n", 1)
         remainder = tail_split[1] if len(tail_split) == 2 else ""
-        block = (
-            f" {verdict}\n"
-            f"**Eval:** {eval_text}\n"
-            f"**Output summary:** {output_summary}\n"
-        )
-        cel.write_text(prefix + "**Evaluation (by Evaluator):" + block + remainder)
+        head = prefix + _EVAL_MARKER
+        cel.write_text(head + block + remainder, encoding="utf-8")
+        self._cel_marker_offset[run_id] = len(head.encode("utf-8"))
 
     # ---------- LLM prompts ----------
     def _build_writer_prompt(self, task: str, context_preview: str) -> str:
@@ -458,17 +506,16 @@ class CodeSandbox:
         fields = {
             "language": req.language,
             "timeout_s": req.timeout_s,
-            "task": (req.task[:200] + "…") if req.task else None,
+            "task": _clip(req.task, 200) or None,
             "writer": writer_note,
         }
         fields = {k: v for k, v in fields.items() if v is not None}
         return json.dumps(fields)
 
     def _summarize_for_cel(self, code: str, stdout: str, stderr: str) -> str:
-        code_snip = code.strip()
-        code_snip = (code_snip[:400] + "…") if len(code_snip) > 400 else code_snip
-        out_snip = (stdout[:400] + "…") if len(stdout) > 400 else stdout
-        err_snip = (stderr[:200] + "…") if len(stderr) > 200 else stderr
+        code_snip = _clip(code.strip(), 400)
+        out_snip = _clip(stdout, 400)
+        err_snip = _clip(stderr, 200)
         parts = ["Code:\n" + code_snip]
         if out_snip:
             parts.append("STDOUT:\n" + out_snip)
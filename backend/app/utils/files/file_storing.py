@@ -2,6 +2,11 @@ from typing import Any, Dict, List
 import pathlib
 import base64
 
+try:
+    import pybase64 as _b64  # SIMD base64; same API as the stdlib module
+except ImportError:  # stdlib fallback
+    _b64 = base64
+
 def save_ws_files(rd: pathlib.Path, files: List[Dict[str, Any]]) -> List[str]:
     """
     Accepts items like:
@@ -19,8 +24,7 @@ def save_ws_files(rd: pathlib.Path, files: List[Dict[str, Any]]) -> List[str]:
             continue
         out = rd / name
         if enc == "base64":
-            import base64
-            out.write_bytes(base64.b64decode(content))
+            out.write_bytes(_b64.b64decode(content))
         else:  # "text" or anything else -> treat as text
             out.write_text(str(content), encoding="utf-8")
         saved.append(str(out))
@@ -34,7 +38,7 @@ def save_b64_files(rd: pathlib.Path, items: List[Dict[str, str]]) -> List[str]:
         name, b64 = it.get("name"), it.get("b64")
         if not name or not b64:
             continue
-        data = base64.b64decode(b64)
+        data = _b64.b64decode(b64)
         out = rd / name
         out.write_bytes(data)
         saved.append(str(out))
@@ -1,15 +1,15 @@
-import re
-
 def _extract_python(code: str) -> str:
     """
     If the LLM returned Markdown-fenced code (``` or ```python), extract the inner code.
     Otherwise, return the original string. Also strips leading/trailing whitespace.
     """
-    if "```" not in code:
+    start = code.find("```")
+    if start < 0:
         return code.strip()
-    # Prefer a language fence block if present
-    m = re.search(r"```(?:python|py)?\s*\n(.*?)\n```", code, re.DOTALL | re.IGNORECASE)
-    if m:
-        return m.group(1).strip()
+    # Body runs from the line after the opening fence (skipping any language tag) to the next fence
+    body = code.find("\n", start + 3) + 1
+    end = code.find("```", body) if body else -1
+    if end >= 0:
+        return code[body:end].strip()
     # Fallback: remove any backticks naively
     return code.replace("```python", "").replace("```", "").strip()
@@ -81,6 +81,8 @@ def _append_cel(base_prefix: str, section: str, content: str) -> None:
 # -----------------------
 # 3) System prompts
 # -----------------------
+_NO_CLARIFICATION = "no_clarification_needed"
+
 CLARIFY_SYSTEM = (
     "You are a careful PM. Decide if the user's request needs clarification to proceed.\n"
     "If clarification is needed, ask ONE concise question. If not, answer exactly 'NO_CLARIFICATION_NEEDED'."
@@ -111,6 +113,7 @@ class MCPState(dict):
     """Conversation + execution state passed through the graph."""
     messages: List[dict]
     _exec_ctx: Dict[str, str]            # {bucket, base_prefix}
+    _exec_system: str                    # exec_system() rendered once per session
     _emit: Callable[[dict], Any]         # WS event emitter
     step_idx: int
     max_steps: int
@@ -138,7 +141,8 @@ async def clarify_node(state: MCPState):
     ]
     resp = await model.ainvoke(user_plus)
     out = (resp.content or "").strip()
-    need = out.upper() != "NO_CLARIFICATION_NEEDED"
+    # Compare only the sentinel-sized prefix; also tolerates trailing punctuation after it.
+    need = out[:len(_NO_CLARIFICATION)].lower() != _NO_CLARIFICATION
 
     if need:
         state["need_clarification"] = True
@@ -187,9 +191,9 @@ async def execute_node(state: MCPState):
     emit = state["_emit"]
     emit({"event": "node", "name": "execute", "step": state.get("step_idx", 0)})
 
-    bucket = state["_exec_ctx"]["bucket"]
-    base_prefix = state["_exec_ctx"]["base_prefix"]
-    sys = exec_system(bucket, base_prefix)
+    # Rendered once at connect so the system prefix is byte-identical across calls
+    # and the provider's prompt cache can reuse it.
+    sys = state.get("_exec_system") or exec_system(state["_exec_ctx"]["bucket"], state["_exec_ctx"]["base_prefix"])
 
     # Prepend system for policy
     prompt = [{"role": "system", "content": sys}, *state["messages"]]
@@ -228,17 +232,20 @@ async def tools_node(state: MCPState):
     bucket = state["_exec_ctx"]["bucket"]
     base_prefix = state["_exec_ctx"]["base_prefix"]
 
-    # Execute each tool call sequentially
     any_done = False
     step_idx = state.get("step_idx", 0)
 
-    for call in tool_calls:
-        name = call.get("name") if isinstance(call, dict) else getattr(call, "name", None)
-        args = call.get("args") if isinstance(call, dict) else getattr(call, "args", {})
+    def _get(call: Any, key: str, default: Any = None) -> Any:
+        return call.get(key, default) if isinstance(call, dict) else getattr(call, key, default)
 
-        # Execute via MCP client
-        result = await _mcp_client.call_tool(name=name, arguments=args)
+    # Tool calls are independent round-trips to the MCP server; dispatch them concurrently.
+    # return_exceptions keeps one failing call from cancelling the rest of the batch.
+    results = await asyncio.gather(
+        *[_mcp_client.call_tool(name=_get(c, "name"), arguments=_get(c, "args", {})) for c in tool_calls],
+        return_exceptions=True,
+    )
 
+    for call, result in zip(tool_calls, results):
         # Try to coerce result into dict
         try:
             payload = result if isinstance(result, dict) else json.loads(result)
@@ -415,6 +422,7 @@ async def ws_mcp_graph(
         state: MCPState = MCPState(
             messages=[],
             _exec_ctx=exec_ctx,
+            _exec_system=exec_system(DEFAULT_BUCKET, base_prefix),
             _emit=emitter,
             step_idx=0,
             max_steps=20,
@@ -449,48 +457,26 @@ async def ws_mcp_graph(
             # Append user message to rolling context
             state["messages"].append({"role": "user", "content": user_text + files_note})
 
-            # ---- Graph phase 1: clarify
+            # One graph run per turn: clarify → todo → (execute → tools)* → reply.
+            # The graph already walks the whole plan/execute loop, so there is no manual re-run here.
             result = await graph.ainvoke(state)
-            # Merge deltas
             state.update(result)
 
-            # If clarification required, pause turn and wait for reply
-            if state.get("need_clarification") and state.get("clarifying_question"):
-                # Wait for a follow-up message on the same socket
+            # If clarification required, the graph stopped at reply; wait for the answer and re-enter
+            while state.get("need_clarification") and state.get("clarifying_question"):
                 follow = await ws.receive_json()
-                if follow.get("type") == "user_message":
-                    clar_text = (follow.get("text") or "").strip()
-                    _append_cel(base_prefix, "user.clarification", clar_text)
-                    # Add as additional context and clear the need flag to continue
-                    state["messages"].append({"role": "user", "content": f"Clarification: {clar_text}"})
-                    state["need_clarification"] = False
-                    state["clarifying_question"] = None
-                else:
+                if follow.get("type") != "user_message":
                     await ws.send_json({"event": "error", "detail": "Expected user_message for clarification."})
-
-            # ---- Graph phase 2: plan → execute loop
-            # Re-enter starting from TODO now that clarification is resolved
-            # (Run small manual loop: todo → (execute → tools)* → reply)
-            todo_res = await todo_node(state)
-            state.update(todo_res)
-
-            while not state.get("done") and state.get("step_idx", 0) < state.get("max_steps", 20):
-                exec_res = await execute_node(state)
-                state.update(exec_res)
-
-                # If model didn’t call tools, break to reply
-                if (lambda m: not _has_tool_calls(m[-1]))(state["messages"]):
-                    break
-
-                tool_res = await tools_node(state)
-                state.update(tool_res)
-
-                if state.get("done"):
-                    break
-
-            # ---- Final respond
-            reply_res = await reply_node(state)
-            state.update(reply_res)
+                    continue
+                clar_text = (follow.get("text") or "").strip()
+                _append_cel(base_prefix, "user.clarification", clar_text)
+                # Add as additional context and clear the need flag to continue
+                state["messages"].append({"role": "user", "content": f"Clarification: {clar_text}"})
+                state["need_clarification"] = False
+                state["clarifying_question"] = None
+
+                result = await graph.ainvoke(state)
+                state.update(result)
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
@@ -13,9 +13,9 @@ Goals (maps to user's requirements):
 
 Design notes
 - Each run/session gets its own Kernel (namespace dict + working dir + Run Log path).
-- Package install uses pip as a subprocess into the current env (demo-friendly).
+- Package install uses uv (or pip) as a subprocess into the current env (demo-friendly).
 - Outputs are captured (stdout/stderr) and a lightweight artifact index is built
-  by hashing files under outputs/. We keep paths relative to the run_dir.
+  by fingerprinting files under outputs/ (BLAKE3/xxHash when installed). We keep paths relative to the run_dir.
 - LLMs are abstracted behind a minimal interface (LLMClient). Wire your model
   of choice (e.g., OpenAI, Anthropic) by implementing .generate().
 
@@ -24,6 +24,9 @@ without sandboxing (containers, seccomp, resource limits, network egress blocks)
 """
 from __future__ import annotations
 
+import ast
+import builtins
+import collections
 import contextlib
 import dataclasses
 import hashlib
@@ -31,20 +34,212 @@ import io
 import json
 import os
 import pathlib
+import queue
 import subprocess
 import sys
 import textwrap
 import threading
 import time
+import types
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import importlib
+import importlib.metadata
 import logging
+
+try:
+    from packaging.requirements import Requirement
+except ImportError:  # packaging ships with pip/setuptools, but don't hard-require it
+    Requirement = None
+try:
+    import blake3
+except ImportError:  # optional; artifact fingerprints fall back to xxhash, then sha256
+    blake3 = None
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 from utils.code_extracters import _extract_python
 from aws.s3_client import S3Client  # NEW
+from components.models import DEFAULT_TTL
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_HASH_CHUNK = 1 << 20
+_RUN_LOG_HEADER = b"# Run Log\n\n"
+_EVAL_ANCHOR = b"**Evaluation:**"
+_CODE_CACHE_SIZE = 128
+_WRITER_CACHE_DIRNAME = ".writer_cache"
+_EXEC_CACHE_SIZE = 64
+_EXEC_CACHE_TTL_S = 600
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+# Plans whose TASK/EVIDENCE read like one of these (and that declare no artifacts) are eligible
+# for the exec result cache; see _is_read_only_plan.
+_READ_ONLY_HINTS = ("schema", "column", "dtype", "preview", "head", "describe", "shape", "inspect", "null", "missing")
+# Calls that change an object in place or write to disk; a cell using any of them is never replayed.
+_MUTATING_CALLS = frozenset({
+    "append", "extend", "insert", "pop", "popitem", "remove", "clear", "update", "setdefault",
+    "sort", "reverse", "add", "discard", "write", "writelines", "write_text", "write_bytes",
+    "to_csv", "to_parquet", "to_excel", "to_json", "to_pickle", "to_feather", "to_sql", "to_hdf",
+    "to_html", "savefig", "mkdir", "touch", "unlink", "rmdir", "setattr", "delattr", "exec", "eval",
+})
+# Substrings of code whose output changes between runs (sampling, clocks, ids).
+_NONDETERMINISTIC = ("random", "sample(", "shuffle", "now(", "today(", "time.time", "perf_counter", "uuid")
+_WHEN_FMT = "%Y-%m-%dT%H:%M:%SZ"
+# Captured output per cell (chars), split evenly between the start and the end of the stream
+_STDOUT_CAP = 64 * 1024
+_STDERR_CAP = 16 * 1024
+
+# Content types for the artifacts cells usually write; anything else is left to the S3 client's guess.
+_CONTENT_TYPES: Dict[str, str] = {
+    ".csv": "text/csv",
+    ".tsv": "text/tab-separated-values",
+    ".json": "application/json",
+    ".jsonl": "application/x-ndjson",
+    ".md": "text/markdown",
+    ".txt": "text/plain",
+    ".html": "text/html",
+    ".py": "text/x-python",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".svg": "image/svg+xml",
+    ".pdf": "application/pdf",
+    ".parquet": "application/vnd.apache.parquet",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".zip": "application/zip",
+}
+
+
+def _new_fingerprint():
+    # Only a short change-detection fingerprint is kept, so a non-cryptographic hash is enough.
+    if blake3 is not None:
+        return blake3.blake3()
+    if xxhash is not None:
+        return xxhash.xxh3_64()
+    return hashlib.sha256()
+
+
+def _hash_file(path: str) -> Tuple[int, str]:
+    """(size, fingerprint hex) of a file, streamed through one reused 1 MiB buffer."""
+    h = _new_fingerprint()
+    size = 0
+    buf = bytearray(_HASH_CHUNK)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+            size += n
+    return size, h.hexdigest()
+
+def _already_satisfied(spec: str) -> bool:
+    """True if the requirement is installed at a version its specifier accepts (no pip needed)."""
+    if Requirement is None:
+        # Without packaging only bare names ("pandas") can be checked.
+        if not spec.replace("-", "").replace("_", "").replace(".", "").isalnum():
+            return False
+        try:
+            importlib.metadata.version(spec)
+            return True
+        except importlib.metadata.PackageNotFoundError:
+            return False
+    try:
+        req = Requirement(spec)
+        if req.url or (req.marker is not None and not req.marker.evaluate()):
+            return False
+        installed = importlib.metadata.version(req.name)
+    except Exception:  # unparsable spec or not installed
+        return False
+    return req.specifier.contains(installed, prereleases=True)
+
+def _is_read_only_plan(task: str) -> bool:
+    """Planner step that declares no artifacts and reads like schema discovery / read-only EDA."""
+    head, sep, artifacts = task.partition("ARTIFACTS:")
+    if not sep:
+        return False
+    for line in artifacts.splitlines():
+        item = line.strip().lstrip("-* ").strip().strip("'\"`").lower()
+        if item and item not in ("none", "n/a"):
+            return False
+    low = head.lower()
+    return any(h in low for h in _READ_ONLY_HINTS)
+
+
+def _is_read_only_code(code: str) -> bool:
+    """No in-place mutation, file writes or nondeterminism visible in the source (conservative)."""
+    if any(tok in code for tok in _NONDETERMINISTIC):
+        return False
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.AugAssign, ast.Delete, ast.Global, ast.Nonlocal)):
+            return False
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for t in targets:
+                if any(isinstance(n, (ast.Subscript, ast.Attribute)) for n in ast.walk(t)):
+                    return False
+        elif isinstance(node, ast.Call):
+            fn = node.func
+            name = fn.attr if isinstance(fn, ast.Attribute) else getattr(fn, "id", None)
+            if name in _MUTATING_CALLS:
+                return False
+            if name == "open" and any(
+                isinstance(a, ast.Constant) and isinstance(a.value, str) and set(a.value) & set("wax+")
+                for a in [*node.args[1:2], *(k.value for k in node.keywords if k.arg == "mode")]
+            ):
+                return False
+            for kw in node.keywords:
+                if kw.arg == "inplace" and not (isinstance(kw.value, ast.Constant) and kw.value.value is False):
+                    return False
+    return True
+
+# Static prompt text, built once at import; per-call prompts only splice in the dynamic parts.
+_WRITER_PREFIX = (
+    "Read the RUN_LOG.md and the context of the current namespace/files, all code in RUN_LOG.md is ran and you can access the variables and outputs produced by that code, unless error occured.\n"
+    "Try not to repeat code that has already been run, instead reuse variables and outputs.\n"
+)
+_REPAIR_PREFIX = (
+    "You wrote a Python cell for the task below, but it failed.\n"
+    "Fix the code. Output ONLY raw Python code for a single cell (no fences, no commentary).\n\n"
+    "HARD RULES:\n"
+    "- Output ONLY raw Python code (no markdown fences).\n"
+    "- NEVER use `return` at top level; do not rely on variable echo. Use print(...) for everything.\n"
+    "- Prefix required diagnostics with 'EVIDENCE:' so they can be parsed.\n"
+    "- After writing each artifact, print: 'ARTIFACT: outputs/<filename>' (relative path under the outputs/ dir).\n"
+    "- Do NOT write files anywhere except under outputs/.\n"
+    "- If a required column or input is missing/unknown, print 'ERROR: <message>' and stop (do not fabricate).\n"
+    "- Always end with: print('DONE')\n"
+    "- If ETL/EDA is required, do it in this cell. Save new outputs under the outputs/ directory.\n"
+    "- Do not validate remote paths or create fake data.\n"
+    "\n"
+    "DO (examples to imitate):\n"
+    "print('EVIDENCE: key=row_count value=', len(df))\n"
+    "df.to_csv('outputs/profile.csv', index=False)\n"
+    "print('ARTIFACT: outputs/profile.csv')\n"
+    "with open('outputs/profile_summary.md', 'w', encoding='utf-8') as f:\n"
+    "    f.write('# Profile Summary\\n...')\n"
+    "print('ARTIFACT: outputs/profile_summary.md')\n"
+    "print('DONE')\n"
+    "\n"
+    "DON'T:\n"
+    "# return results  # FORBIDDEN\n"
+    "# df.head()       # Invisible without print\n"
+    "# display(df)     # Invisible here\n"
+)
+_REPAIR_SUFFIX = (
+    "Guidance:\n- Use CWD-relative paths.\n- Prefer simple, explicit code.\n"
+    "- Always save files to 'outputs/'.\n"
+)
+
 # --------------------------- Public Interfaces --------------------------------
 
 class LLMClient:
@@ -75,6 +270,55 @@ class ExecResult:
 
 # ----------------------------- Kernel -----------------------------------------
 
+class _CappedWriter(io.TextIOBase):
+    """Text sink that keeps at most head_cap + tail_cap chars: the start and the end of the stream.
+
+    Print-spamming cells can't grow the captured output without bound, and what consumers read
+    survives: prompts slice from the head, while tracebacks and the timeout banner land in the tail.
+    """
+
+    def __init__(self, head_cap: int, tail_cap: int):
+        self._head: List[str] = []
+        self._head_len = 0
+        self._head_cap = head_cap
+        self._tail: collections.deque = collections.deque()
+        self._tail_len = 0
+        self._tail_cap = tail_cap
+        self._dropped = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        n = len(s)
+        if self._head_len < self._head_cap:
+            take = s[:self._head_cap - self._head_len]
+            self._head.append(take)
+            self._head_len += len(take)
+            s = s[len(take):]
+            if not s:
+                return n
+        if len(s) >= self._tail_cap:
+            self._dropped += self._tail_len + len(s) - self._tail_cap
+            self._tail.clear()
+            s = s[-self._tail_cap:]
+            self._tail_len = 0
+        self._tail.append(s)
+        self._tail_len += len(s)
+        while self._tail_len - len(self._tail[0]) >= self._tail_cap:
+            first = self._tail.popleft()
+            self._tail_len -= len(first)
+            self._dropped += len(first)
+        return n
+
+    def getvalue(self) -> str:
+        tail = "".join(self._tail)
+        dropped = self._dropped + max(0, len(tail) - self._tail_cap)
+        if dropped:
+            tail = f"\n[Sandbox] … {dropped} chars truncated …\n" + tail[-self._tail_cap:]
+        return "".join(self._head) + tail
+
+
 class Kernel:
     """One stateful Python execution context per run/session."""
     def __init__(self, run_dir: pathlib.Path):
@@ -84,22 +328,33 @@ class Kernel:
             "__name__": "__sandbox__",
             "__file__": str(self.run_dir / "__cell__.py"),
             "RUN_DIR": self.run_dir,
+            # Set once so exec() doesn't have to insert the builtins reference on every call
+            "__builtins__": builtins,
         }
         self.locals: Dict[str, Any] = self.globals
+        # time.monotonic() of the last get_kernel for this session; drives idle eviction
+        self.last_used = time.monotonic()
+        # Long-lived worker for timed cells, so a stuck cell can be abandoned
+        self._jobs: Optional[queue.Queue] = None
+        # blake2b(source) -> (dedented source, code object or None), LRU
+        self._code_cache: "collections.OrderedDict[bytes, Tuple[str, Optional[types.CodeType]]]" = collections.OrderedDict()
 
     def exec_code(self, code: str, timeout_s: Optional[int] = None) -> Tuple[str, str, Optional[Any]]:
-        """Execute *Python* code in this kernel, capturing stdout/stderr."""
-        normalized = textwrap.dedent(code)
+        """Execute *Python* code in this kernel, capturing stdout/stderr.
+
+        Untimed cells run on the calling thread. A timed cell goes to this kernel's worker thread
+        and is abandoned on timeout, so the caller (the server's event loop) always gets control
+        back on time; an in-cell alarm could be swallowed by a bare `except:` or stall in a C call.
+
+        SystemExit from the cell (sys.exit()/exit()) is reported in stderr like any other error;
+        only KeyboardInterrupt propagates.
+        """
         last_value: Optional[Any] = None
-        try:
-            compiled = compile(normalized, str(self.run_dir / "__cell__.py"), "exec")
-        except SyntaxError:
-            try:
-                compiled = compile(normalized, str(self.run_dir / "__cell__.py"), "single")
-            except Exception:
-                compiled = None
+        normalized, compiled = self._compile(code)
 
-        stdout_buf, stderr_buf = io.StringIO(), io.StringIO()
+        stdout_buf = _CappedWriter(_STDOUT_CAP // 2, _STDOUT_CAP // 2)
+        stderr_buf = _CappedWriter(_STDERR_CAP // 2, _STDERR_CAP // 2)
+        timeout_msg = f"\n[Sandbox] Timeout after {timeout_s}s — cell did not complete.\n"
 
         def _run():
             nonlocal last_value
@@ -112,7 +367,9 @@ class Kernel:
                 else:
                     exec(normalized, self.globals, self.locals)
                 last_value = self.globals.get("_", None)
-            except Exception:
+            except KeyboardInterrupt:
+                raise
+            except BaseException:  # SystemExit must not escape into the server
                 import traceback
                 traceback.print_exc(file=stderr_buf)
             finally:
@@ -121,15 +378,67 @@ class Kernel:
                 except Exception:
                     pass
 
-        thread = threading.Thread(target=lambda: self._redirected(_run, stdout_buf, stderr_buf), daemon=True)
-        thread.start()
-        thread.join(timeout=timeout_s)
-        if thread.is_alive():
-            stderr_buf.write(f"\n[Sandbox] Timeout after {timeout_s}s — cell did not complete.\n")
+        if not timeout_s:
+            self._redirected(_run, stdout_buf, stderr_buf)
+        elif not self._submit(lambda: self._redirected(_run, stdout_buf, stderr_buf), timeout_s):
+            stderr_buf.write(timeout_msg)
         return stdout_buf.getvalue(), stderr_buf.getvalue(), last_value
 
+    def _compile(self, code: str) -> Tuple[str, Optional[types.CodeType]]:
+        """dedent + compile, memoized by a hash of the raw source (retries often resend the same cell)."""
+        key = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        hit = self._code_cache.get(key)
+        if hit is not None:
+            self._code_cache.move_to_end(key)
+            return hit
+        normalized = textwrap.dedent(code)
+        try:
+            compiled = compile(normalized, str(self.run_dir / "__cell__.py"), "exec")
+        except SyntaxError:
+            try:
+                compiled = compile(normalized, str(self.run_dir / "__cell__.py"), "single")
+            except Exception:
+                compiled = None
+        self._code_cache[key] = (normalized, compiled)
+        if len(self._code_cache) > _CODE_CACHE_SIZE:
+            self._code_cache.popitem(last=False)
+        return normalized, compiled
+
+    def _submit(self, fn, timeout_s: float) -> bool:
+        """Run fn on the kernel's worker thread; False if it didn't finish within timeout_s."""
+        if self._jobs is None:
+            jobs: queue.Queue = queue.Queue()
+
+            def _worker():
+                while True:
+                    job, done = jobs.get()
+                    if job is None:
+                        return
+                    try:
+                        job()
+                    finally:
+                        done.set()
+
+            threading.Thread(target=_worker, daemon=True).start()
+            self._jobs = jobs
+        done = threading.Event()
+        self._jobs.put((fn, done))
+        if done.wait(timeout_s):
+            return True
+        # The stuck cell can't be killed; leave that worker behind and start a fresh one next time.
+        self._jobs = None
+        return False
+
+    def shutdown(self) -> None:
+        """Stop the worker thread (if any) and drop the namespace so its objects can be freed."""
+        if self._jobs is not None:
+            self._jobs.put((None, None))
+            self._jobs = None
+        self.globals.clear()
+        self._code_cache.clear()
+
     @staticmethod
-    def _redirected(fn, out: io.StringIO, err: io.StringIO):
+    def _redirected(fn, out: io.TextIOBase, err: io.TextIOBase):
         with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
             fn()
 
@@ -145,19 +454,80 @@ class CodeSandbox:
         s3_prefix: str = "threads",  # s3://bucket/threads/<thread_id>/artifacts/...
         outputs_dirname: str = "outputs",
         inputs_dirname: str = "inputs",
+        pip_cache_dir: str = "~/.cache/arrowai-pip",
+        wheelhouse: Optional[str] = None,
+        preload: Iterable[str] = ("pandas as pd", "numpy as np", "json", "pathlib", "os"),
+        max_kernels: int = 64,
+        kernel_ttl_s: float = DEFAULT_TTL,
+        writer_cache: bool = True,
     ):
+        """
+        At most max_kernels sessions keep a live kernel; the least recently used one is evicted
+        beyond that, and any kernel idle for kernel_ttl_s is dropped on the next get_kernel.
+        Session files on disk are kept, only the in-memory namespace goes.
+
+        With writer_cache, code the LLM writer produced for a task and that ran without error is
+        kept under <run_dir>/.writer_cache/ (so it goes when the session directory is deleted) and reused instead of calling the writer again when
+        the same session repeats the task against the same input file contents and namespace names.
+
+        s3_client is shared by every kernel and by the concurrent artifact uploads, so its
+        connection pool must be wider than the upload fan-out (16 files x 8 parts); the
+        S3Client default of 128 pooled connections is sized for that. Use default_s3_client()
+        to get one.
+        """
         self.base_tmp = pathlib.Path(base_tmp_dir).resolve()
         self.base_tmp.mkdir(parents=True, exist_ok=True)
-        self._kernels: Dict[str, Kernel] = {}
+        # thread_id -> Kernel, least recently used first
+        self._kernels: "collections.OrderedDict[str, Kernel]" = collections.OrderedDict()
+        self._kernels_lock = threading.Lock()
+        self.max_kernels = max_kernels
+        self.kernel_ttl_s = kernel_ttl_s
+        # "module" or "module as alias" bound into every new kernel's globals
+        self.preload = tuple(preload)
+        # (st_dev, st_ino) -> (mtime_ns, size, fingerprint) from previous artifact scans
+        self._artifact_cache: Dict[Tuple[int, int], Tuple[int, int, str]] = {}
+        # exec key -> (monotonic time stored, ExecResult, artifacts) for read-only steps that left
+        # the namespace, inputs/ and outputs/ untouched; see exec_cell. LRU, oldest first.
+        self._exec_cache: "collections.OrderedDict[str, Tuple[float, ExecResult, List[Dict[str, Any]]]]" = collections.OrderedDict()
+        self._exec_cache_lock = threading.Lock()
+        # thread_id -> byte offset of the pending '**Evaluation:**' line in RUN_LOG.md
+        self._eval_anchor_offset: Dict[str, int] = {}
+
+        # Requirement specs already installed by ensure_packages in this process
+        self._installed: set[str] = set()
+        # Persistent wheel/HTTP cache shared by every install (mount it as a volume in containers),
+        # plus an optional local wheelhouse searched before the index.
+        self.pip_cache_dir = os.path.expanduser(pip_cache_dir)
+        self.wheelhouse = os.path.abspath(os.path.expanduser(wheelhouse)) if wheelhouse else None
+
+        # Per session: <run_dir>/.writer_cache/<_writer_cache_key>.py holding the last code that ran cleanly
+        self.writer_cache = writer_cache
 
         # S3 config
         self.s3: Optional[S3Client] = s3_client
         self.s3_prefix = s3_prefix.strip("/ ")
+        # S3 key -> (fingerprint, size) of the last successful upload, to skip re-PUTting unchanged files
+        self._uploaded: Dict[str, Tuple[str, int]] = {}
 
         # Layout
         self.outputs_dirname = outputs_dirname.strip("/ ")
         self.inputs_dirname = inputs_dirname.strip("/ ")
 
+    @staticmethod
+    def default_s3_client(bucket: Optional[str] = None) -> S3Client:
+        """S3Client configured from the environment (MCP_BUCKET, AWS_REGION, AWS_* credentials).
+
+        boto3 clients are thread-safe and S3Client reuses one client per configuration, so a
+        single instance can back every sandbox and upload thread in the process.
+        """
+        return S3Client(
+            bucket_name=bucket or os.environ.get("MCP_BUCKET", "arrowai"),
+            region_name=os.environ.get("AWS_REGION", "ap-southeast-1"),
+            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+            max_pool_connections=128,
+        )
+
     # ---------- Kernel/session management ----------
     def _run_dir(self, thread_id: str) -> pathlib.Path:
         return self.base_tmp / thread_id
@@ -169,45 +539,153 @@ class CodeSandbox:
         (rd / self.inputs_dirname).mkdir(parents=True, exist_ok=True)
 
     def get_kernel(self, thread_id: str) -> Kernel:
-        if thread_id not in self._kernels:
+        with self._kernels_lock:
+            kernel = self._kernels.get(thread_id)
+            if kernel is not None:
+                self._kernels.move_to_end(thread_id)
+        if kernel is None:
             self._ensure_layout(thread_id)
             kernel = Kernel(self._run_dir(thread_id))
+            self._preload_modules(kernel)
             # inject convenience globals
             kernel.globals["OUTPUTS_DIR"] = str(self._run_dir(thread_id) / self.outputs_dirname)
             kernel.globals["INPUTS_DIR"] = str(self._run_dir(thread_id) / self.inputs_dirname)
-            self._kernels[thread_id] = kernel
+            with self._kernels_lock:
+                kernel = self._kernels.setdefault(thread_id, kernel)
         else:
             # Make sure layout still exists (idempotent)
             self._ensure_layout(thread_id)
-            k = self._kernels[thread_id]
-            k.globals["OUTPUTS_DIR"] = str(self._run_dir(thread_id) / self.outputs_dirname)
-            k.globals["INPUTS_DIR"] = str(self._run_dir(thread_id) / self.inputs_dirname)
-        return self._kernels[thread_id]
+            kernel.globals["OUTPUTS_DIR"] = str(self._run_dir(thread_id) / self.outputs_dirname)
+            kernel.globals["INPUTS_DIR"] = str(self._run_dir(thread_id) / self.inputs_dirname)
+        kernel.last_used = time.monotonic()
+        self._evict_kernels()
+        return kernel
+
+    def drop_kernel(self, thread_id: str) -> bool:
+        """Shut down and forget the session's kernel; False if it had none."""
+        with self._kernels_lock:
+            kernel = self._kernels.pop(thread_id, None)
+        self._forget_thread_state(thread_id)
+        if kernel is None:
+            return False
+        kernel.shutdown()
+        return True
+
+    def _evict_kernels(self) -> None:
+        """Drop kernels idle past kernel_ttl_s, then least recently used ones beyond max_kernels."""
+        now = time.monotonic()
+        evicted: List[Tuple[str, Kernel]] = []
+        with self._kernels_lock:
+            # Ordered by recency, so the first kernel still within its TTL ends the idle sweep.
+            while self._kernels:
+                tid, k = next(iter(self._kernels.items()))
+                if len(self._kernels) <= self.max_kernels and now - k.last_used < self.kernel_ttl_s:
+                    break
+                del self._kernels[tid]
+                evicted.append((tid, k))
+        for tid, k in evicted:
+            logger.info(f"Evicting idle kernel for thread {tid} (idle {now - k.last_used:.0f}s)")
+            self._forget_thread_state(tid)
+            k.shutdown()
+
+    def _forget_thread_state(self, thread_id: str) -> None:
+        """Drop per-thread caches that are only valid for the kernel being discarded."""
+        self._purge_exec_cache(thread_id)
+        self._eval_anchor_offset.pop(thread_id, None)
+
+    def _preload_modules(self, kernel: Kernel) -> None:
+        """Pre-bind common modules so cells using them skip the import statement entirely."""
+        for spec in self.preload:
+            name, _, alias = spec.partition(" as ")
+            name = name.strip()
+            try:
+                kernel.globals[alias.strip() or name.split(".")[0]] = importlib.import_module(name)
+            except Exception as e:
+                logger.info(f"preload skipped {name}: {e}")
 
     # ---------- Package management ----------
     def ensure_packages(self, packages: Iterable[str]) -> Tuple[bool, str]:
-        """Install packages via pip into the current environment."""
-        if not packages:
+        """Install packages into the current environment (uv if available, else pip).
+
+        No --upgrade: already-satisfied requirements are left alone. Specs installed earlier in
+        this process, or already present at an acceptable version, are skipped without spawning
+        anything.
+        """
+        pending = [p for p in (packages or []) if p not in self._installed]
+        for spec in [p for p in pending if _already_satisfied(p)]:
+            self._installed.add(spec)
+            pending.remove(spec)
+        if not pending:
             return True, ""
-        cmd = [sys.executable, "-m", "pip", "install", "--upgrade", *packages]
-        try:
-            proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        env = {**os.environ, "PIP_NO_INPUT": "1", "PIP_DISABLE_PIP_VERSION_CHECK": "1"}
+        cache = ["--cache-dir", self.pip_cache_dir]
+        if self.wheelhouse:
+            cache += ["--find-links", pathlib.Path(self.wheelhouse).as_uri()]
+        cmds = (
+            ["uv", "pip", "install", "--python", sys.executable, *cache, *pending],  # uv prefers wheels already
+            [sys.executable, "-m", "pip", "install", "--prefer-binary", *cache, *pending],
+        )
+        for cmd in cmds:
+            try:
+                proc = subprocess.run(cmd, capture_output=True, text=True, check=False, env=env)
+            except FileNotFoundError:
+                continue  # uv not on PATH
+            except Exception as e:  # pragma: no cover
+                return False, f"pip failed: {e}"
             ok = proc.returncode == 0
+            if ok:
+                self._installed.update(pending)
             log = (proc.stdout or "") + (proc.stderr or "")
             return ok, log
-        except Exception as e:  # pragma: no cover
-            return False, f"pip failed: {e}"
+        return False, "pip failed: no installer found"
 
     # ---------- Run Log utilities ----------
     def run_log_path(self, thread_id: str) -> pathlib.Path:
         return self._run_dir(thread_id) / "RUN_LOG.md"
     
-    def _append_run_log(self, thread_id: str, text: str) -> None:
+    def run_log_tail(self, thread_id: str, max_bytes: int = 4096) -> Optional[str]:
+        """Last `max_bytes` of RUN_LOG.md via one seek+read (None if there is no log yet)."""
+        try:
+            with self.run_log_path(thread_id).open("rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - max_bytes))
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # errors="ignore" drops a UTF-8 sequence cut by the seek
+        return data.decode("utf-8", errors="ignore")
+
+    def run_log_since(self, thread_id: str, offset: int = 0) -> Tuple[str, int, int]:
+        """
+        (text, start, end): RUN_LOG.md bytes [start, end) decoded, normally with start == offset.
+        Everything written since a previous read lands at or past its end (the eval patch only
+        touches the newest step), so a caller can keep a running copy. start is 0 when the file
+        is now shorter than `offset` and had to be read again from the top.
+        """
+        try:
+            with self.run_log_path(thread_id).open("rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < offset:
+                    offset = 0
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return "", 0, 0
+        return data.decode("utf-8", errors="ignore"), offset, offset + len(data)
+
+    def _append_log_bytes(self, thread_id: str, data: bytes) -> int:
+        """Append to RUN_LOG.md (header first if new); returns the byte offset `data` landed at."""
         logf = self.run_log_path(thread_id)
         logf.parent.mkdir(parents=True, exist_ok=True)
-        header = "# Run Log\n\n"
-        prev = logf.read_text(encoding="utf-8", errors="ignore") if logf.exists() else header
-        logf.write_text(prev + text + "\n", encoding="utf-8")
+        with logf.open("ab") as f:
+            if f.tell() == 0:
+                f.write(_RUN_LOG_HEADER)
+            offset = f.tell()
+            f.write(data)
+        return offset
+
+    def _append_run_log(self, thread_id: str, text: str) -> None:
+        self._append_log_bytes(thread_id, (text + "\n").encode("utf-8"))
 
     def _append_run_step(
         self,
@@ -219,12 +697,9 @@ class CodeSandbox:
         artifacts: List[Dict[str, Any]],
         evaluation_line: str = "PENDING",
     ) -> None:
-        logf = self.run_log_path(thread_id)
-        logf.parent.mkdir(parents=True, exist_ok=True)
-        when = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        art_lines = "\n".join(
-            f"- {a['name']}: `{a['path']}` (size={a['size']})" for a in artifacts
-        )
+        when = time.strftime(_WHEN_FMT, time.gmtime())
+        art_lines = "\n".join([f"- {a['name']}: `{a['path']}` (size={a['size']})" for a in artifacts])
+        # Adjacent f-strings compile to a single BUILD_STRING: one allocation, no intermediate `+` copies.
         block = (
             f"### Step: {tool_name}\n"
             f"**When:** {when}\n"
@@ -232,57 +707,110 @@ class CodeSandbox:
             f"**Final Code ({attempts_used} Fixes):**\n```\n{final_code}\n```\n"
             f"**Artifacts:**\n{art_lines or '- none'}\n"
             f"**Evaluation:** {evaluation_line}\n"
-        )
-        header = "# Run Log\n\n"
-        prev = logf.read_text(encoding="utf-8", errors="ignore") if logf.exists() else header
-        logf.write_text(prev + block, encoding="utf-8")
-        
+        ).encode("utf-8")
+        offset = self._append_log_bytes(thread_id, block)
+        # Remember where this step's Evaluation line is so the evaluator can patch it in place.
+        self._eval_anchor_offset[thread_id] = offset + block.rindex(_EVAL_ANCHOR)
+
     def _update_last_eval_block(self, thread_id: str, verdict: str, eval_text: str, output_summary: str) -> None:
         """Replace last '**Evaluation (by Evaluator):' with a structured block."""
         run_log = self.run_log_path(thread_id)
-        text = run_log.read_text() if run_log.exists() else ""
-        if not text:
-            return
-        parts = text.rsplit("**Evaluation:**", 1)
-        if len(parts) != 2:
+        if not run_log.exists():
             return
-        prefix, tail = parts
-        tail_split = tail.split("\n", 1)
-        remainder = tail_split[1] if len(tail_split) == 2 else ""
         block = (
             f" {verdict}\n"
             f"**Eval:** {eval_text}\n"
             f"**Output summary:** {output_summary}\n"
-        )
-        run_log.write_text(prefix + "**Evaluation (by Evaluator):**" + block + remainder)
+        ).encode("utf-8")
+
+        # Fast path: seek to the anchor recorded by _append_run_step and rewrite only the tail.
+        anchor = self._eval_anchor_offset.pop(thread_id, None)
+        if anchor is not None:
+            with run_log.open("r+b") as f:
+                f.seek(anchor)
+                tail = f.read()
+                if tail.startswith(_EVAL_ANCHOR):
+                    tail_split = tail.split(b"\n", 1)
+                    remainder = tail_split[1] if len(tail_split) == 2 else b""
+                    f.seek(anchor)
+                    f.write(b"**Evaluation (by Evaluator):**" + block + remainder)
+                    f.truncate()
+                    return
+
+        text = run_log.read_bytes()
+        if not text:
+            return
+        parts = text.rsplit(_EVAL_ANCHOR, 1)
+        if len(parts) != 2:
+            return
+        prefix, tail = parts
+        tail_split = tail.split(b"\n", 1)
+        remainder = tail_split[1] if len(tail_split) == 2 else b""
+        run_log.write_bytes(prefix + b"**Evaluation (by Evaluator):**" + block + remainder)
 
     # ---------- Artifact indexing ----------
     def _artifact_index(self, run_dir: pathlib.Path, only_under: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Scan files for artifacts. If only_under is set, scan only that subdirectory.
-        Returns list of dicts: {name, path (relative to run_dir), size, sha256}
+        Returns list of dicts: {name, path (relative to run_dir), size, hash}
         """
-        artifacts: List[Dict[str, Any]] = []
         base = run_dir / only_under if only_under else run_dir
         if not base.exists():
-            return artifacts
+            return []
 
-        for p in base.rglob("*"):
-            if not p.is_file():
-                continue
-            try:
-                data = p.read_bytes()
-            except Exception:
+        # os.walk classifies entries from scandir's d_type; the os.stat below is the only stat per file.
+        entries: List[Tuple[str, os.stat_result]] = []
+        for root, _dirs, files in os.walk(base, followlinks=False):
+            for fn in files:
+                p = os.path.join(root, fn)
+                try:
+                    entries.append((p, os.stat(p)))
+                except OSError:  # vanished or dangling symlink
+                    continue
+
+        # Unchanged files (same inode, mtime and size as last scan) reuse their cached fingerprint.
+        digests: Dict[str, Tuple[int, str]] = {}
+        todo: List[Tuple[str, os.stat_result]] = []
+        for path, st in entries:
+            hit = self._artifact_cache.get((st.st_dev, st.st_ino))
+            if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+                digests[path] = (st.st_size, hit[2])
+            else:
+                todo.append((path, st))
+
+        if len(todo) <= 1:
+            hashed = [self._hash_one(path) for path, _ in todo]
+        else:
+            # File reads and hash updates release the GIL, so threads overlap disk and CPU.
+            with ThreadPoolExecutor(max_workers=min(8, len(todo), (os.cpu_count() or 1) * 2)) as ex:
+                hashed = list(ex.map(self._hash_one, [path for path, _ in todo]))
+        for (path, st), res in zip(todo, hashed):
+            if res is None:
                 continue
-            rel = p.relative_to(run_dir)
-            artifacts.append({
-                "name": p.name,
-                "path": str(rel).replace("\\", "/"),
-                "size": len(data),
-                "sha256": hashlib.sha256(data).hexdigest()[:12],
-            })
+            digests[path] = res
+            self._artifact_cache[(st.st_dev, st.st_ino)] = (st.st_mtime_ns, st.st_size, res[1])
+
+        root = str(run_dir)
+        artifacts = [
+            {
+                "name": os.path.basename(path),
+                "path": os.path.relpath(path, root).replace("\\", "/"),
+                "size": size,
+                "hash": digest,
+            }
+            for path, (size, digest) in digests.items()
+        ]
+        artifacts.sort(key=lambda a: a["path"])
         return artifacts
 
+    @staticmethod
+    def _hash_one(path: str) -> Optional[Tuple[int, str]]:
+        try:
+            size, digest = _hash_file(path)
+        except Exception:
+            return None
+        return size, digest[:12]
+
     # ---------- S3 sync ----------
     def _s3_key_for(self, thread_id: str, relpath: str) -> str:
         norm = relpath.replace("\\", "/").lstrip("./")
@@ -294,9 +822,13 @@ class CodeSandbox:
         """
         Upload each artifact (outputs/ only) to S3.
         Returns a new list with ONLY: { name, path: S3 URI (or local if no S3), size }.
+        Uploaded entries also carry presigned_url (GET, 10 min) so clients can stream the bytes
+        straight from S3 instead of round-tripping them through MCP.
         """
         run_dir = self._run_dir(thread_id)
         out: List[Dict[str, Any]] = []
+        fingerprints: List[Optional[str]] = []  # parallel to out
+        uploads: List[Tuple[int, pathlib.Path, str]] = []  # (slot in out, local file, key)
 
         prefix = f"{self.outputs_dirname}/".replace("\\", "/")
 
@@ -307,40 +839,156 @@ class CodeSandbox:
                 continue
 
             local = (run_dir / a["path"]).resolve()
-            if not local.is_file():
-                out.append({"name": a["name"], "path": a["path"], "size": a["size"]})
+            out.append({"name": a["name"], "path": a["path"], "size": a["size"]})
+            fingerprints.append(a.get("hash"))
+            if not local.is_file() or not self.s3:
+                # Missing file or no S3 → keep the local relative path
                 continue
-
-            if not self.s3:
-                # No S3 → return local relative path
-                out.append({"name": a["name"], "path": a["path"], "size": a["size"]})
+            key = self._s3_key_for(thread_id, a["path"])
+            if self._uploaded.get(key) == (a.get("hash"), a["size"]):
+                # Same content as the object we already uploaded under this key
+                out[-1] = {
+                    "name": a["name"],
+                    "uri": f"s3://{self.s3.bucket}/{key}",
+                    "presigned_url": self.s3.presigned_get(key, expires_in=600),
+                    "size": a["size"],
+                }
                 continue
+            uploads.append((len(out) - 1, local, key))
 
-            key = self._s3_key_for(thread_id, a["path"])
+        if not uploads:
+            return out
+
+        def _upload(job: Tuple[int, pathlib.Path, str]) -> None:
+            slot, local, key = job
+            a = out[slot]
             try:
+                # Pass the path, never the bytes: put_file streams from disk via upload_file/CRT.
                 self.s3.put_file(
                     local_path=str(local),
                     key=key,
-                    content_type=None,     # auto-guess via client
+                    content_type=_CONTENT_TYPES.get(os.path.splitext(a["name"])[1].lower()),  # None → client guesses
                     metadata={"thread_id": thread_id, "filename": a.get("name", "")},
                     compute_sha256=False,
+                    # Large files go multipart (16 MiB parts); cap part threads since files upload side by side.
+                    max_concurrency=8,
                 )
-                out.append({
+                out[slot] = {
                     "name": a["name"],
                     "uri": f"s3://{self.s3.bucket}/{key}",
+                    "presigned_url": self.s3.presigned_get(key, expires_in=600),
                     "size": a["size"],
-                })
+                }
+                if fingerprints[slot]:
+                    self._uploaded[key] = (fingerprints[slot], a["size"])
             except Exception as e:
                 logger.warning(f"S3 upload failed for {local}: {e}")
-                out.append({"name": a["name"], "path": a["path"], "size": a["size"]})
 
+        # S3 handles concurrent PUTs from one client well; total time ~ N/workers round trips.
+        with ThreadPoolExecutor(max_workers=min(16, len(uploads))) as ex:
+            list(ex.map(_upload, uploads))
         return out
 
+    # ---------- Exec result cache ----------
+    @staticmethod
+    def _namespace_fingerprint(kernel: Kernel) -> bytes:
+        """Which objects the kernel's names are bound to (not their contents); scalars by value,
+        since get_kernel rebinds OUTPUTS_DIR/INPUTS_DIR to equal fresh strings."""
+        h = hashlib.blake2b(digest_size=16)
+        for name in sorted(k for k in kernel.globals if not k.startswith("__")):
+            v = kernel.globals[name]
+            ref = repr(v) if type(v) in _SCALAR_TYPES else id(v)
+            h.update(f"{name}={ref};".encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+    def _inputs_fingerprint(self, run_dir: pathlib.Path) -> bytes:
+        """Names, sizes and mtimes of everything under inputs/, so a re-upload changes the key."""
+        h = hashlib.blake2b(digest_size=16)
+        base = str(run_dir / self.inputs_dirname)
+        entries = []
+        for root, _dirs, files in os.walk(base):
+            for fn in files:
+                p = os.path.join(root, fn)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                entries.append(f"{os.path.relpath(p, base)}:{st.st_size}:{st.st_mtime_ns};")
+        for e in sorted(entries):
+            h.update(e.encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+    def _exec_cache_key(self, thread_id: str, req: ExecRequest, ns_fp: bytes, inputs_fp: bytes) -> str:
+        names = ",".join(sorted(str(f.get("name") or "") for f in (req.files_in or [])))
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{req.code or ''}|{req.task or ''}|{names}|".encode("utf-8", "surrogatepass"))
+        h.update(ns_fp)
+        h.update(inputs_fp)
+        return f"{thread_id}:{h.hexdigest()}"
+
+    def _exec_cache_get(self, key: str) -> Optional[Tuple[ExecResult, List[Dict[str, Any]]]]:
+        with self._exec_cache_lock:
+            hit = self._exec_cache.get(key)
+            if hit is None:
+                return None
+            if time.monotonic() - hit[0] > _EXEC_CACHE_TTL_S:
+                self._exec_cache.pop(key, None)
+                return None
+            self._exec_cache.move_to_end(key)
+            return hit[1], hit[2]
+
+    def _exec_cache_put(self, key: str, res: ExecResult, artifacts: List[Dict[str, Any]]) -> None:
+        with self._exec_cache_lock:
+            self._exec_cache[key] = (time.monotonic(), res, artifacts)
+            self._exec_cache.move_to_end(key)
+            while len(self._exec_cache) > _EXEC_CACHE_SIZE:
+                self._exec_cache.popitem(last=False)
+
+    def _purge_exec_cache(self, thread_id: str) -> None:
+        prefix = f"{thread_id}:"
+        with self._exec_cache_lock:
+            for key in [k for k in self._exec_cache if k.startswith(prefix)]:
+                del self._exec_cache[key]
+
+    # ---------- Writer cache ----------
+    def _writer_cache_key(self, thread_id: str, req: ExecRequest, kernel: Kernel) -> str:
+        """Scoped to the session, and to what the generated code reads: input file contents and
+        the namespace names the writer prompt offered for reuse."""
+        run_dir = self._run_dir(thread_id)
+        inputs = [f"{a['path']}:{a['hash']}" for a in self._artifact_index(run_dir, only_under=self.inputs_dirname)]
+        ns_keys = sorted(k for k in kernel.globals if not k.startswith("__"))
+        h = hashlib.sha256()
+        for part in (thread_id, req.task or "", ",".join(inputs), ",".join(ns_keys)):
+            h.update(part.encode("utf-8", "surrogatepass") + b"\x00")
+        return h.hexdigest()
+
+    def _writer_cache_path(self, thread_id: str, key: str) -> pathlib.Path:
+        return self._run_dir(thread_id) / _WRITER_CACHE_DIRNAME / f"{key}.py"
+
+    def _writer_cache_get(self, thread_id: str, key: str) -> Optional[str]:
+        try:
+            return self._writer_cache_path(thread_id, key).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _writer_cache_put(self, thread_id: str, key: str, code: Optional[str]) -> None:
+        """Store code under key; None drops the entry."""
+        path = self._writer_cache_path(thread_id, key)
+        try:
+            if code is None:
+                path.unlink(missing_ok=True)
+                return
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(code, encoding="utf-8")
+            os.replace(tmp, path)  # readers never see a partial file
+        except OSError as e:
+            logger.warning(f"Writer cache update failed for {key}: {e}")
+
     # ---------- LLM prompts ----------
     def _build_writer_prompt(self, task: str, context_preview: str, run_log: str) -> str:
         return (
-            "Read the RUN_LOG.md and the context of the current namespace/files, all code in RUN_LOG.md is ran and you can access the variables and outputs produced by that code, unless error occured.\n"
-            "Try not to repeat code that has already been run, instead reuse variables and outputs.\n"
+            f"{_WRITER_PREFIX}"
             f"Task:\n{task}\n\n"
             f"Run Log (most recent 2000 chars):\n{run_log[-2000:]}\n\n"
             f"Preview of namespace/files:\n{context_preview}\n"
@@ -364,37 +1012,11 @@ class CodeSandbox:
 
     def _build_repair_prompt(self, task: str, code: str, stdout: str, stderr: str) -> str:
         return (
-            "You wrote a Python cell for the task below, but it failed.\n"
-            "Fix the code. Output ONLY raw Python code for a single cell (no fences, no commentary).\n\n"
-            "HARD RULES:\n"
-            "- Output ONLY raw Python code (no markdown fences).\n"
-            "- NEVER use `return` at top level; do not rely on variable echo. Use print(...) for everything.\n"
-            "- Prefix required diagnostics with 'EVIDENCE:' so they can be parsed.\n"
-            "- After writing each artifact, print: 'ARTIFACT: outputs/<filename>' (relative path under the outputs/ dir).\n"
-            "- Do NOT write files anywhere except under outputs/.\n"
-            "- If a required column or input is missing/unknown, print 'ERROR: <message>' and stop (do not fabricate).\n"
-            "- Always end with: print('DONE')\n"
-            "- If ETL/EDA is required, do it in this cell. Save new outputs under the outputs/ directory.\n"
-            "- Do not validate remote paths or create fake data.\n"
-            "\n"
-            "DO (examples to imitate):\n"
-            "print('EVIDENCE: key=row_count value=', len(df))\n"
-            "df.to_csv('outputs/profile.csv', index=False)\n"
-            "print('ARTIFACT: outputs/profile.csv')\n"
-            "with open('outputs/profile_summary.md', 'w', encoding='utf-8') as f:\n"
-            "    f.write('# Profile Summary\\n...')\n"
-            "print('ARTIFACT: outputs/profile_summary.md')\n"
-            "print('DONE')\n"
-            "\n"
-            "DON'T:\n"
-            "# return results  # FORBIDDEN\n"
-            "# df.head()       # Invisible without print\n"
-            "# display(df)     # Invisible here\n"
+            f"{_REPAIR_PREFIX}"
             f"Task:\n{task}\n\n"
             f"Previous code:\n{code}\n\n"
             f"STDOUT (truncated):\n{stdout[:2000]}\n\nSTDERR (truncated):\n{stderr[:2000]}\n"
-            "Guidance:\n- Use CWD-relative paths.\n- Prefer simple, explicit code.\n"
-            "- Always save files to 'outputs/'.\n"
+            f"{_REPAIR_SUFFIX}"
         )
 
     @staticmethod
@@ -464,19 +1086,59 @@ class CodeSandbox:
         if not req.code and not req.use_llm_writer:
             raise ValueError("No code provided and use_llm_writer is False")
 
+        # A schema-discovery / read-only step repeated against the same namespace bindings and the
+        # same input files as a cell that changed nothing: replay its result instead of writing,
+        # running and evaluating it again. Other steps always run.
+        exec_key = None
+        hit = None
+        if req.task and _is_read_only_plan(req.task):
+            ns_before = self._namespace_fingerprint(kernel)
+            inputs_before = self._inputs_fingerprint(run_dir)
+            exec_key = self._exec_cache_key(thread_id, req, ns_before, inputs_before)
+            hit = self._exec_cache_get(exec_key)
+            if hit is None:
+                outputs_before = [(a["path"], a["hash"]) for a in self._artifact_index(run_dir, only_under=self.outputs_dirname)]
+        if hit is not None:
+            res, artifacts = hit
+            self._append_run_step(
+                thread_id=thread_id,
+                tool_name="sandbox.exec",
+                inputs_summary=self._inputs_summary(req, "result reused from an identical earlier cell"),
+                attempts_used=0,
+                final_code=(res.code or {}).get("text") or "",
+                artifacts=artifacts,
+                evaluation_line=f"(reused) {res.summary[:800]}",
+            )
+            self._eval_anchor_offset.pop(thread_id, None)  # nothing to patch
+            return res
+        # Any cell that actually runs may mutate objects in place, which the id()-based namespace
+        # fingerprint can't see; earlier results for this thread are no longer trustworthy.
+        self._purge_exec_cache(thread_id)
+
         code_to_run = ""
         writer_note = None  # ensure defined in both paths
+        cache_key = None
+        cached_code = None
 
         if req.code:
             code_to_run = _extract_python(req.code)
-        elif req.use_llm_writer and code_llm and req.task:
+        elif req.use_llm_writer and code_llm and req.task and self.writer_cache:
+            cache_key = self._writer_cache_key(thread_id, req, kernel)
+            cached_code = self._writer_cache_get(thread_id, cache_key)
+        if cached_code is not None:
+            code_to_run = cached_code
+            writer_note = "code reused from writer cache"
+        elif not req.code and req.use_llm_writer and code_llm and req.task:
             ns_keys = sorted([k for k in list(kernel.globals.keys()) if not k.startswith("__")])
             input_files = list((run_dir / self.inputs_dirname).glob("*"))
             output_files = list((run_dir / self.outputs_dirname).glob("*"))
-            current_files = list(run_dir.glob("*"))
+            current_files = [f for f in run_dir.glob("*") if f.name != _WRITER_CACHE_DIRNAME]
             preview = f"Namespace keys: {ns_keys[:50]}\nFiles in {self.inputs_dirname}/: {[f.name for f in input_files][:20]}\nFiles in {self.outputs_dirname}/: {[f.name for f in output_files][:20]}\nAll files in run dir: {[f.name for f in current_files][:20]}"
             
-            run_log = self.run_log_path(thread_id).read_text(encoding="utf-8", errors="ignore") if self.run_log_path(thread_id).exists() else "New session."
+            # The prompt only uses the last 2000 chars; don't read the whole log to get them.
+            run_log = self.run_log_tail(thread_id, 4 * 2000)
+            if run_log is None:
+                run_log = "New session."
 
             prompt = self._build_writer_prompt(req.task, preview, run_log)
             code_to_run = _extract_python(code_llm.generate(prompt))
@@ -504,6 +1166,13 @@ class CodeSandbox:
             display=display,
         )
 
+        if cache_key:
+            if self._has_error(stderr):
+                if cached_code is not None:
+                    self._writer_cache_put(thread_id, cache_key, None)  # cached code no longer works here
+            elif cached_code is None or attempts_used:
+                self._writer_cache_put(thread_id, cache_key, code_to_run)
+
         # (3) Artifact scan — outputs/ only
         artifacts = self._artifact_index(run_dir, only_under=self.outputs_dirname)
 
@@ -519,11 +1188,17 @@ class CodeSandbox:
             evaluation_line="PENDING",
         )
 
-        # Rescan outputs/ so any run-log-triggered files in outputs (rare) would be included
-        artifacts_after = self._artifact_index(run_dir, only_under=self.outputs_dirname)
+        # The Run Log lives at the run_dir root, so appending to it can't change outputs/ — no rescan.
+        artifacts_after = artifacts
 
         logger.info(f"exec_cell: thread_id={thread_id}, final code:\n{code_to_run}\n--- end code ---\n\n")
 
+        # (6) Sync artifacts (outputs/ only) to S3 and reduce to minimal surface (name, path, size).
+        # Needs nothing from the evaluation, so the uploads run while the eval LLM call is in flight.
+        sync_pool = ThreadPoolExecutor(max_workers=1)
+        sync_fut = sync_pool.submit(self._sync_artifacts_to_s3, thread_id, artifacts_after)
+        sync_pool.shutdown(wait=False)
+
         # (5) LLM evaluation (optional) — DO NOT pass Run Log content
         verdict = None
         eval_text = ""
@@ -568,10 +1243,9 @@ class CodeSandbox:
             "text": code_to_run or "",
         }
 
-        # (6) Sync artifacts (outputs/ only) to S3 and reduce to minimal surface (name, path, size)
-        files_out_minimal = self._sync_artifacts_to_s3(thread_id, artifacts_after)
+        files_out_minimal = sync_fut.result()
 
-        return ExecResult(
+        result = ExecResult(
             ok=ok,
             code=code_obj,
             stdout=stdout,
@@ -580,6 +1254,18 @@ class CodeSandbox:
             files_out=files_out_minimal,   # ONLY name, path (S3 or local), size
             summary=final_summary,
         )
+        # Only store when nothing observable changed: no rebinding, no in-place mutation or writes
+        # in the code, same inputs, and the same outputs/ index.
+        if (
+            exec_key
+            and ok
+            and _is_read_only_code(code_to_run or "")
+            and self._namespace_fingerprint(kernel) == ns_before
+            and self._inputs_fingerprint(run_dir) == inputs_before
+            and [(a["path"], a["hash"]) for a in artifacts_after] == outputs_before
+        ):
+            self._exec_cache_put(exec_key, result, artifacts_after)
+        return result
 
     # ---------- Helpers ----------
     def _inputs_summary(self, req: ExecRequest, writer_note: Optional[str]) -> str:
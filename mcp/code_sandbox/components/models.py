@@ -1,25 +1,36 @@
+from dataclasses import dataclass
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional
+from typing import Annotated, Any, Dict, List, Optional
 
 DEFAULT_TTL = 1800  # seconds
 
 # ----------------- Models (IO schemas) -----------------
 
-class FileIn(BaseModel):
+# Hot-path request types: slotted dataclasses instead of BaseModel instances. Validation stays
+# with pydantic: FastMCP validates them once at the tool boundary (pydantic handles stdlib
+# dataclasses) and the Annotated Field()s keep the descriptions in the generated tool schema.
+
+@dataclass(slots=True)
+class FileIn:
     name: str
-    path: str = Field(..., description="Full path of the file e.g s3://bucket/key")
+    path: Annotated[str, Field(description="Full path of the file e.g s3://bucket/key")]
     size: Optional[int] = None
 
 
-class CodeExecInput(BaseModel):
-    thread_id: str = Field(..., description="Unique ID for the session")
-    # code: Optional[str] = Field(None, description="Code to execute")
-    task: str = Field(..., description="Natural language description of the task to accomplish with the code")
+@dataclass(slots=True)
+class CodeExecInput:
+    thread_id: Annotated[str, Field(description="Unique ID for the session")]
+    task: Annotated[str, Field(description="Natural language description of the task to accomplish with the code")]
     timeout_s: Optional[int] = 30
-    # pip: Optional[List[str]] = None
-    files_in: Optional[List[FileIn]] = Field(default_factory=list, description="List of input files to be downloaded before execution")
+    files_in: Annotated[Optional[List[FileIn]], Field(description="List of input files to be downloaded before execution")] = None
     max_steps: int = 7
     repair_attempts: int = 2
+    stream_inputs: Annotated[bool, Field(description="Stream large (>=1MB) inputs from S3 instead of downloading them first")] = False
+
+    def __post_init__(self):
+        if self.files_in is None:
+            self.files_in = []
+
 
 class CreateSessionIn(BaseModel):
     run_id: Optional[str] = None
@@ -45,7 +56,7 @@ class FileSpec(BaseModel):
     name: str
     path: str
     size: int
-    sha256: str
+    hash: str
 
 class ExecCellOut(BaseModel):
     ok: bool
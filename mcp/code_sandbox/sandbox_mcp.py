@@ -1,6 +1,11 @@
 # mcp/sandbox/sandbox_mcp.py
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import functools
+import itertools
+import json
 import pathlib
 import time
 import os
@@ -11,15 +16,14 @@ from mcp.server.fastmcp import FastMCP, Context  # SDK's FastMCP, stdio-friendly
 from components.executor import CodeSandbox, ExecRequest  # your code
 from components.models import CodeExecInput
 from services.openai_client import OpenAIClient  # your OpenAI wrapper
-from utils.LLMAdapter import LLMAdapter  # your LLMClient adapter
-
-from aws.s3_client import S3Client  # your S3 wrapper
-s3c = S3Client(
-    bucket_name=os.environ.get("MCP_BUCKET", "arrowai"),
-    region_name=os.environ.get("AWS_REGION", "ap-southeast-1"),
-    aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
-)
+from utils.LLMAdapter import CachingLLMAdapter, LLMAdapter  # your LLMClient adapter
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+s3c = CodeSandbox.default_s3_client()
 
 host = os.getenv("SANDBOX_HOST", "127.0.0.1")
 port = int(os.getenv("SANDBOX_PORT", "8787"))
@@ -44,29 +48,135 @@ def _setup_logging():
 _setup_logging()
 log = logging.getLogger("sandbox")
 
+# thread_id -> resolved run_dir / created inputs dir; dropped in kill_session
+_RUN_DIR_CACHE: Dict[str, pathlib.Path] = {}
+_INPUTS_DIR_CACHE: Dict[str, pathlib.Path] = {}
+
 def _run_dir(thread_id: str) -> pathlib.Path:
-    return sandbox._run_dir(thread_id).resolve()
+    rd = _RUN_DIR_CACHE.get(thread_id)
+    if rd is None:
+        rd = _RUN_DIR_CACHE[thread_id] = sandbox._run_dir(thread_id).resolve()
+    return rd
 
 def _inputs_dir(thread_id: str) -> pathlib.Path:
     """Absolute path to run_dir/inputs for this thread."""
-    rd = _run_dir(thread_id)
-    d = rd / sandbox.inputs_dirname
-    d.mkdir(parents=True, exist_ok=True)
+    d = _INPUTS_DIR_CACHE.get(thread_id)
+    if d is None:
+        d = _run_dir(thread_id) / sandbox.inputs_dirname
+        d.mkdir(parents=True, exist_ok=True)
+        _INPUTS_DIR_CACHE[thread_id] = d
     return d
 
+STREAM_MIN_BYTES = 1024 * 1024
+PLANNER_LOG_CHARS = int(os.getenv("SANDBOX_PLANNER_LOG_CHARS", "8000"))
+
+def _window_run_log(txt: str, max_chars: int = PLANNER_LOG_CHARS) -> str:
+    """Seed section (task + input files, up to the first '---') plus the last max_chars of the log."""
+    if len(txt) <= max_chars:
+        return txt
+    head_end = txt.find("\n---\n")
+    head = txt[: head_end + 5] if 0 <= head_end < 4000 else ""
+    return f"{head}\n(log truncated, showing last {max_chars} chars)\n\n{txt[-max_chars:]}"
+
+def _bind_streamed_inputs(thread_id: str, streamed: Dict[str, str], inputs_dir: pathlib.Path) -> None:
+    """Expose not-downloaded inputs to the kernel as INPUTS_URI plus open_input()/fetch_input()."""
+    g = sandbox.get_kernel(thread_id).globals
+    uris: Dict[str, str] = dict(g.get("INPUTS_URI") or {})
+    uris.update(streamed)
+    g["INPUTS_URI"] = uris
+
+    def _key(name: str) -> str:
+        uri = uris[name]
+        if not uri.startswith("s3://"):
+            return uri
+        bucket = uri[5:].split("/", 1)[0]
+        if bucket != s3c.bucket:
+            # The client is bound to one bucket, like the download path.
+            raise ValueError(f"{name}: {uri} is not in bucket {s3c.bucket}")
+        return s3c.parse_s3_uri(uri)
+
+    def open_input(name: str):
+        """Sequential binary stream of an INPUTS_URI object (no local copy)."""
+        return s3c.s3.get_object(Bucket=s3c.bucket, Key=_key(name))["Body"]
+
+    def fetch_input(name: str) -> str:
+        """Download an INPUTS_URI object into INPUTS_DIR and return the local path."""
+        dst = inputs_dir / name
+        s3c.download_file(_key(name), str(dst))
+        return str(dst)
+
+    g["open_input"] = open_input
+    g["fetch_input"] = fetch_input
+
+def _tool_json(obj: Any) -> str:
+    """
+    Serialize a tool result ourselves. FastMCP would otherwise dump dict results twice
+    (structured content + an indent=2 text block); tools return this compact text instead.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")  # serializes dataclasses natively
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+def _json_default(o: Any) -> Any:
+    return dataclasses.asdict(o) if dataclasses.is_dataclass(o) else str(o)
+
 def _rfc3339(ts: float) -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+    return _rfc3339_s(int(ts))
+
+@functools.lru_cache(maxsize=1024)
+def _rfc3339_s(secs: int) -> str:
+    # Second resolution, and mtimes in one listing cluster, so most calls are cache hits;
+    # strftime already beats hand-rolled digit formatting on a miss.
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(secs))
 
 def _now_ms() -> int:
-    return int(time.perf_counter() * 1000)
+    return time.monotonic_ns() // 1_000_000
+
+_REQ_COUNTER = itertools.count()
 
 def _mk_req_id(thread_id: str) -> str:
-    return f"{thread_id}:{_now_ms()}"
+    # Unique within the process; no clock read needed.
+    return f"{thread_id}:{next(_REQ_COUNTER)}"
+
+class _CtxLog:
+    """
+    Queues ctx.info/debug/error and sends them, in order, from one background task so the
+    orchestrator never waits on the transport for a progress message. aclose() drains the queue.
+    """
+    def __init__(self, ctx: Context):
+        self._ctx = ctx
+        self._q: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while True:
+            level, msg = await self._q.get()
+            try:
+                await getattr(self._ctx, level)(msg)
+            except Exception as e:  # a dropped progress message must not fail the run
+                log.debug(f"ctx.{level} failed: {e}")
+            finally:
+                self._q.task_done()
+
+    def info(self, msg: str) -> None:
+        self._q.put_nowait(("info", msg))
+
+    def debug(self, msg: str) -> None:
+        self._q.put_nowait(("debug", msg))
+
+    def error(self, msg: str) -> None:
+        self._q.put_nowait(("error", msg))
+
+    async def aclose(self) -> None:
+        await self._q.join()
+        self._task.cancel()
 
 # ---------- LLMs ----------
 _oai = OpenAIClient()
 
-CODE_SYSTEM = """
+# The system prompts are static, interned once, and sent first with a stable prompt_cache_key so
+# OpenAI's prompt cache can reuse the tokenized prefix across calls.
+CODE_SYSTEM = sys.intern("""
 You write a SINGLE Python cell to satisfy the TASK.
 
 ENVIRONMENT & OUTPUT CONTRACT
@@ -92,15 +202,18 @@ ENVIRONMENT & OUTPUT CONTRACT
 - At the very end, print the sentinel:
     DONE
 - If you recieve an s3:// path as input, you can assume it is downloaded under INPUTS_DIR/ and can be read by filename or by joining with INPUTS_DIR.
+- EXCEPT files listed in INPUTS_URI ({name: s3_uri}): those were NOT downloaded. Read them with open_input(name), a sequential
+  stream (e.g. `pd.read_csv(open_input(name))`), or call fetch_input(name) to download one and get its local path when the
+  format needs random access (parquet, xlsx, zip).
 
 STYLE & SAFETY
 - Be defensive: use try/except around I/O; on failure, `print("ERROR:", message)` and STOP.
 - Prefer compact, parseable output. For tables, print `df.head(10).to_csv(index=False)` or `to_json(orient="records")` on a single line after `EVIDENCE:`.
 - Do NOT print entire huge dataframes unless explicitly requested.
 - Paths: read inputs by filename if present in CWD, or by joining with INPUTS_DIR. Write outputs ONLY under outputs/ (e.g., `open("outputs/foo.txt","w")` or `open(os.path.join(OUTPUTS_DIR,"foo.txt"),"w")`). Never write outside outputs/.
-"""
+""")
 
-EVAL_SYSTEM = (
+EVAL_SYSTEM = sys.intern(
     "You evaluate and summarize code runs.\n"
     "Inputs (JSON): {task, stdout, stderr, files_out}\n"
     "Return ONE JSON object ONLY:\n"
@@ -115,7 +228,7 @@ EVAL_SYSTEM = (
     "- If stderr is non-empty, verdict is usually FAIL unless stdout clearly fulfilled the task."
 )
 
-WRITER_SYSTEM = (
+WRITER_SYSTEM = sys.intern(
     "You are a senior consultant. Output ONLY one concrete task the coding agent will execute now.\n"
     "Max number of steps: 7.\n"
     "Do not repeat what was already done in prior steps in the RUN_LOG.md. (User could ask for a summary or a specific detail from previous steps.)\n"
@@ -133,19 +246,36 @@ WRITER_SYSTEM = (
     "ARTIFACTS:\n- <files or 'none'>\n"
 )
 
+# Per-step planner instructions are static too, so they live in the system prompt; the user turn
+# carries only the task and the (append-only) RUN_LOG.md, in that order.
+PLANNER_SYSTEM = sys.intern(
+    WRITER_SYSTEM
+    + "\nDecide the SINGLE next step to execute now.\n"
+    "If the RUN_LOG.md does not already show confirmed columns/dtypes and a parsed date column, you MUST pick a schema discovery task.\n"
+    "If information is missing and you cannot proceed, output exactly 'CLARIFY'.\n"
+    "If the user goal is met, output exactly 'TASK_COMPLETE'.\n"
+    "Remember the Evidence & Artifacts contracts.\n"
+)
+
 
 code_llm = LLMAdapter(
     client=_oai,
     model=os.getenv("SANDBOX_CODE_MODEL","gpt-4.1-mini"),
     temperature=0.1,
     system=CODE_SYSTEM,
+    prompt_cache_key="sandbox_code_v1",
 )
 eval_llm = LLMAdapter(
     client=_oai,
     model=os.getenv("SANDBOX_EVAL_MODEL","gpt-4.1-mini"),
     temperature=0.0,
     system=EVAL_SYSTEM,
+    prompt_cache_key="sandbox_eval_v1",
 )
+if os.getenv("SANDBOX_EVAL_CACHE", "1") != "0":
+    # Only an identical eval prompt (same task, code, stdout and stderr) gets the stored verdict:
+    # near-duplicates can differ by the one traceback line that flips PASS to FAIL.
+    eval_llm = CachingLLMAdapter(eval_llm)
 
 # ---------- Tools ----------
 @mcp.tool(
@@ -157,11 +287,12 @@ eval_llm = LLMAdapter(
         "loops until TASK_COMPLETE/CLARIFY/max_steps."
         "You may give this tool an extensive task, and it will break it down into smaller steps and execute them one by one."
     ),
+    structured_output=False,
 )
 async def orchestrate_eda_etl(
     input: CodeExecInput,
     ctx: Context,
-) -> Dict[str, Any]:
+) -> str:
     """
     Executes general coding workflows in multiple small steps:
       1) Download inputs to run_dir/inputs/.
@@ -173,31 +304,71 @@ async def orchestrate_eda_etl(
     Returns ok, artifacts across ALL steps, and the tail of RUN_LOG.md.
     """
     req_id = _mk_req_id(input.thread_id)
+    clog = _CtxLog(ctx)
     try:
         sandbox.get_kernel(input.thread_id)
-        await ctx.info(f"[ORCH] thread={input.thread_id} args:\n{input.model_dump_json(indent=2)}")
+        clog.info(f"[ORCH] thread={input.thread_id} task={input.task[:160]!r} files_in={len(input.files_in or [])}")
+        if log.isEnabledFor(logging.DEBUG):
+            # Full request dump (O(files_in)) only when debugging; compact, no indent.
+            clog.debug(f"[ORCH] args={_tool_json(input)}")
 
         # -------- download inputs once --------
-        dl_start = time.perf_counter()
+        dl_start = time.monotonic_ns()
         local_files_in: List[Dict[str, Any]] = []
         inputs_dir = _inputs_dir(input.thread_id)
         total_bytes = 0
 
-        for f in (input.files_in or []):
-            t1 = time.perf_counter()
-            dst = inputs_dir / f.name
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            try:
-                s3c.download_file(f.path, dst)
-                size = f.size if getattr(f, "size", None) is not None else (dst.stat().st_size if dst.exists() else None)
-                local_files_in.append({"name": f.name, "path": str(dst), "size": size})
-                total_bytes += int(size or 0)
-                await ctx.info(f"[ORCH] downloaded file={f.name} bytes={size} ms={int((time.perf_counter()-t1)*1000)} -> {dst}")
-            except Exception as e:
-                await ctx.error(f"[ORCH] download error file={f.name} s3={f.path} err={e}")
-
-        dl_ms = int((time.perf_counter() - dl_start) * 1000)
-        await ctx.info(f"[ORCH] download summary files={len(local_files_in)}/{len(input.files_in or [])} bytes={total_bytes} ms={dl_ms}")
+        # One transfer manager for the whole batch: objects download concurrently and large ones
+        # are split into parallel ranged GETs.
+        files = list(input.files_in or [])
+        streamed: Dict[str, str] = {}
+        if getattr(input, "stream_inputs", False):
+            # Large inputs stay in S3 and are read as streams; small ones are cheaper to stage.
+            streamed = {f.name: f.path for f in files if (f.size or 0) >= STREAM_MIN_BYTES}
+            files = [f for f in files if f.name not in streamed]
+        # download_many creates each distinct parent directory once, so no per-file mkdir here.
+        inputs_root = str(inputs_dir)
+        pairs = [(f.path, os.path.join(inputs_root, f.name)) for f in files]
+        t1 = time.monotonic_ns()
+        # Off the event loop: other sessions' tool calls keep running while this batch transfers.
+        errors = await asyncio.to_thread(s3c.download_many, pairs) if pairs else []
+        batch_ms = (time.monotonic_ns() - t1) // 1_000_000
+
+        results: List[Dict[str, Any]] = []
+        for f, (_, dst), err in zip(files, pairs, errors):
+            if err is not None:
+                results.append({"file": f, "error": err})
+                continue
+            size = f.size
+            if size is None:
+                try:
+                    size = os.stat(dst).st_size  # one syscall, no exists() pre-check
+                except OSError:
+                    size = None
+            results.append({"file": f, "dst": dst, "size": size})
+
+        dl_records: List[Dict[str, Any]] = []
+        for r in results:  # input order
+            f = r["file"]
+            if "error" in r:
+                clog.error(f"[ORCH] download error file={f.name} s3={f.path} err={r['error']}")
+                continue
+            local_files_in.append({"name": f.name, "path": r["dst"], "size": r["size"]})
+            total_bytes += int(r["size"] or 0)
+            dl_records.append({"file": f.name, "bytes": r["size"]})
+
+        for name, uri in streamed.items():
+            size = next(f.size for f in input.files_in if f.name == name)
+            local_files_in.append({"name": name, "path": uri, "size": size})
+        if streamed:
+            _bind_streamed_inputs(input.thread_id, streamed, inputs_dir)
+
+        dl_ms = (time.monotonic_ns() - dl_start) // 1_000_000
+        # One message for the whole batch instead of one per file.
+        clog.info(
+            f"[ORCH] download summary files={len(local_files_in)}/{len(input.files_in or [])} "
+            f"bytes={total_bytes} ms={dl_ms} batch_ms={batch_ms} downloaded={_tool_json(dl_records)}"
+        )
 
         # -------- seed RUN_LOG once --------
         header = (
@@ -213,46 +384,51 @@ async def orchestrate_eda_etl(
         need_clarification = False
         aggregated_files_out: List[Dict[str, Any]] = []
         last_res = None
+        run_log_txt, run_log_off = "", 0  # RUN_LOG.md contents seen so far and the byte offset they end at
 
         while step_idx < max_steps and not (completed or need_clarification):
             step_idx += 1
-            rl_path = sandbox.run_log_path(input.thread_id)
-            run_log_txt = rl_path.read_text(encoding="utf-8", errors="ignore") if rl_path.exists() else "# Run Log\n\n"
-
-            task_prompt = (
-                "Decide the SINGLE next step to execute now.\n"
-                "If the RUN_LOG.md does not already show confirmed columns/dtypes and a parsed date column, you MUST pick a schema discovery task.\n"
-                "If information is missing and you cannot proceed, output exactly 'CLARIFY'.\n"
-                "If the user goal is met, output exactly 'TASK_COMPLETE'.\n"
-                "Remember the Evidence & Artifacts contracts.\n\n"
-                f"RUN_LOG.md:\n{run_log_txt}\n\n"
-                f"User task:\n{input.task}\n"
-            )
-            resp = _oai.generate(
+            # Read only what was appended since the last step instead of the whole growing file.
+            appended, start, run_log_off = sandbox.run_log_since(input.thread_id, run_log_off)
+            run_log_txt = run_log_txt + appended if start else appended
+
+            # Stable across steps first (task), growing part last (RUN_LOG.md only ever gets appended to).
+            task_prompt = f"User task:\n{input.task}\n\nRUN_LOG.md:\n{_window_run_log(run_log_txt) or '# Run Log'}\n"
+            # Planner round-trip in a worker thread so it doesn't block the event loop.
+            resp = await asyncio.to_thread(
+                _oai.generate,
                 model=os.getenv("SANDBOX_PLANNER_MODEL", "gpt-4.1-mini"),
-                system=WRITER_SYSTEM,  # now references RUN_LOG.md
+                system=PLANNER_SYSTEM,  # WRITER_SYSTEM + step instructions
                 text=task_prompt,
                 max_output_tokens=1200,
                 temperature=0.1,
+                prompt_cache_key="sandbox_planner_v1",
             )
             plan = _oai.output_text(resp).strip()
-            sandbox._append_run_log(input.thread_id, f"## Execute {step_idx} — Plan\n\n{plan}\n\n")
-            await ctx.info(f"[ORCH] step={step_idx} plan:\n{plan}")
+            # RUN_LOG.md sections for this step, written with one append each time instead of one per
+            # section ("\n".join matches the newline _append_run_log adds after every entry).
+            step_log = [f"## Execute {step_idx} — Plan\n\n{plan}\n\n"]
+            clog.info(f"[ORCH] step={step_idx} plan:\n{plan}")
 
             # early exits (strict equality)
             if plan == "TASK_COMPLETE":
                 completed = True
-                sandbox._append_run_log(input.thread_id, "**Result:** TASK_COMPLETE\n\n---\n")
-                await ctx.info(f"[ORCH] step={step_idx} TASK_COMPLETE (no execution)")
+                step_log.append("**Result:** TASK_COMPLETE\n\n---\n")
+                sandbox._append_run_log(input.thread_id, "\n".join(step_log))
+                clog.info(f"[ORCH] step={step_idx} TASK_COMPLETE (no execution)")
                 break
             if plan == "CLARIFY":
                 need_clarification = True
-                sandbox._append_run_log(input.thread_id, "**Result:** CLARIFY\n\n")
-                await ctx.info(f"[ORCH] step={step_idx} CLARIFY (no execution)")
+                step_log.append("**Result:** CLARIFY\n\n")
+                sandbox._append_run_log(input.thread_id, "\n".join(step_log))
+                clog.info(f"[ORCH] step={step_idx} CLARIFY (no execution)")
                 break
 
+            # exec_cell appends its own step record, so the plan has to be on disk before it runs.
+            sandbox._append_run_log(input.thread_id, "\n".join(step_log))
+
             # execute single cell
-            t_exec = time.perf_counter()
+            t_exec = time.monotonic_ns()
             req = ExecRequest(
                 code=None,
                 language="python",
@@ -269,37 +445,40 @@ async def orchestrate_eda_etl(
                 eval_llm=eval_llm,
             )
             last_res = res
-            exec_ms = int((time.perf_counter() - t_exec) * 1000)
+            exec_ms = (time.monotonic_ns() - t_exec) // 1_000_000
 
             # log stdout/stderr + artifacts into RUN_LOG.md
             # stdout = res.stdout or ""
             # sandbox._append_run_log(input.thread_id, f"### Stdout (step {step_idx})\n\n```\n{stdout}\n```\n\n")
+            step_log = []
             if getattr(res, "stderr", None):
-                sandbox._append_run_log(input.thread_id, f"### Stderr (step {step_idx})\n\n```\n{res.stderr}\n```\n\n")
+                step_log.append(f"### Stderr (step {step_idx})\n\n```\n{res.stderr}\n```\n\n")
 
             step_files = res.files_out or []
             if step_files:
                 aggregated_files_out.extend(step_files)
                 bullets = "\n".join([f"- **{f.get('name')}** — {f.get('size')} bytes — {f.get('path')}" for f in step_files])
-                sandbox._append_run_log(input.thread_id, f"### Artifacts (step {step_idx})\n\n{bullets}\n\n")
+                step_log.append(f"### Artifacts (step {step_idx})\n\n{bullets}\n\n")
+            if step_log:
+                sandbox._append_run_log(input.thread_id, "\n".join(step_log))
 
-            await ctx.info(f"[ORCH] step={step_idx} ok={res.ok} exec_ms={exec_ms} files_out={len(step_files)}")
+            clog.info(f"[ORCH] step={step_idx} ok={res.ok} exec_ms={exec_ms} files_out={len(step_files)}")
 
         # -------- final return (safe) --------
         final_ok = bool(last_res.ok) if last_res else completed
-        final_run_log = sandbox.run_log_path(input.thread_id).read_text(encoding="utf-8", errors="ignore") if sandbox.run_log_path(input.thread_id).exists() else "# Run Log\n\n"
+        final_run_log = sandbox.run_log_tail(input.thread_id, 4 * 1024) or "# Run Log\n\n"
 
-        return {
+        return _tool_json({
             "ok": final_ok,
             "files_out": aggregated_files_out,
             "run_log": final_run_log[-1024:] or "",
             "steps_executed": step_idx,
             "completed": completed,
             "need_clarification": need_clarification,
-        }
+        })
     except Exception as e:
         log.exception(f"[ORCH_ERROR] req_id={req_id} thread={input.thread_id} ERROR={e}")
-        return {
+        return _tool_json({
             "ok": False,
             "files_out": [],
             "run_log": "",
@@ -307,29 +486,37 @@ async def orchestrate_eda_etl(
             "completed": False,
             "need_clarification": False,
             "summary": f"Execution error: {e}",
-        }
+        })
+    finally:
+        await clog.aclose()  # every queued progress message goes out before the result
 
-@mcp.tool()
-def list_artifacts(thread_id: str) -> Dict[str, Any]:
+@mcp.tool(structured_output=False)
+def list_artifacts(thread_id: str) -> str:
     """
     Return the artifact index (name, path, size) for the session, restricted to outputs/.
     """
     arts = sandbox._artifact_index(_run_dir(thread_id), only_under=sandbox.outputs_dirname)
-    return {"artifacts": arts}
+    return _tool_json({"artifacts": arts})
 
-@mcp.tool()
-def kill_session(thread_id: str, delete_files: bool = False) -> Dict[str, bool]:
+@mcp.tool(structured_output=False)
+def kill_session(thread_id: str, delete_files: bool = False) -> str:
     """
     Terminate the in-memory kernel; optionally delete the session directory.
     """
-    sandbox._kernels.pop(thread_id, None)
+    sandbox.drop_kernel(thread_id)
+    rd = _run_dir(thread_id)
+    _RUN_DIR_CACHE.pop(thread_id, None)
+    _INPUTS_DIR_CACHE.pop(thread_id, None)
     if delete_files:
         import shutil
-        shutil.rmtree(_run_dir(thread_id), ignore_errors=True)
-    return {"terminated": True}
+        shutil.rmtree(rd, ignore_errors=True)
+    return _tool_json({"terminated": True})
 
 # ---------- Entrypoint ----------
 
 if __name__ == "__main__":
-    log.info("Starting Sandbox MCP (HTTP) …")
-    mcp.run(transport="streamable-http")  # or "sse" or "stdio"
+    # stdio for a same-host client that spawns this process (no HTTP framing per call);
+    # streamable-http stays the default since the backend connects to SANDBOX_MCP_WS over HTTP.
+    transport = os.getenv("SANDBOX_TRANSPORT", "streamable-http")
+    log.info(f"Starting Sandbox MCP ({transport}) …")
+    mcp.run(transport=transport)  # "streamable-http", "sse" or "stdio"
@@ -1,11 +1,15 @@
-import os, base64, mimetypes, pathlib, io
+import os, base64, mimetypes, pathlib, io, socket
 from typing import Any, Iterable, List, Optional, Union, Dict
 
+import httpx
 from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
+INLINE_IMAGE_MAX_BYTES = 64 * 1024   # larger local images are uploaded and sent by file_id
+INLINE_TEXT_MAX_BYTES = 512 * 1024   # inlined .md/.log/.txt files keep only their last N bytes
+
 # ---------- Helpers ----------
 def _is_http_url(s: str) -> bool:
     return s.startswith("http://") or s.startswith("https://")
@@ -45,23 +49,68 @@ def _read_bytes(obj: Union[str, bytes, io.BytesIO, "PIL.Image.Image"]) -> tuple[
         return data, _guess_mime(p.name)
     raise TypeError(f"Unsupported image/file object: {type(obj)}")
 
+def _read_inline_text(p: pathlib.Path, max_bytes: Optional[int] = None) -> str:
+    """File text for inlining; anything past max_bytes is cut from the front (logs grow at the end)."""
+    max_bytes = INLINE_TEXT_MAX_BYTES if max_bytes is None else max_bytes
+    with p.open("rb") as fh:
+        size = fh.seek(0, os.SEEK_END)
+        fh.seek(max(0, size - max_bytes))
+        data = fh.read()
+    # errors="ignore" also drops a UTF-8 sequence cut by the seek
+    text = data.decode("utf-8", errors="ignore")
+    return f"(truncated, last {max_bytes} of {size} bytes)\n{text}" if size > max_bytes else text
+
 def _ext(path: str) -> str:
     return pathlib.Path(path).suffix.lower()
 
+_HTTP_CLIENT: Optional[httpx.Client] = None
+
+def _shared_http_client() -> httpx.Client:
+    """One keep-alive pool for every OpenAIClient in the process (HTTP/2 when h2 is installed)."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        try:
+            import h2  # noqa: F401  # httpx needs it for http2=True
+            http2 = True
+        except ImportError:
+            http2 = False
+        # With an explicit transport, pool settings go on the transport (httpx ignores them on Client).
+        transport = httpx.HTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=300),
+            retries=2,  # connect failures only; the SDK retries 5xx/429 itself
+            # Bigger send buffer so file uploads keep the window full on high-RTT links
+            socket_options=[(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)],
+        )
+        _HTTP_CLIENT = httpx.Client(transport=transport, timeout=httpx.Timeout(600.0, connect=10.0))
+    return _HTTP_CLIENT
+
 # ---------- Client ----------
 class OpenAIClient:
     def __init__(self, *, api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.client = OpenAI(
             api_key=api_key or os.getenv("OPENAI_API_KEY"),
             base_url=base_url or os.getenv("OPENAI_BASE_URL") or None,
+            http_client=_shared_http_client(),
         )
+        # (abs path, mtime_ns, size, purpose) -> file_id, so an unchanged file is uploaded once per client
+        self._upload_cache: Dict[tuple, str] = {}
 
     # --- FILE UPLOAD (PDF/CSV/etc.) ---
     def upload_file(self, path: str, purpose: str = "user_data") -> str:
-        with open(path, "rb") as f:
-            file = self.client.files.create(file=f, purpose=purpose)
+        # 1 MiB reads; the SDK retries transient 5xx/429/connection errors with backoff (3 attempts here)
+        with open(path, "rb", buffering=1 << 20) as f:
+            file = self.client.with_options(max_retries=3).files.create(file=f, purpose=purpose)
         return file.id
 
+    def upload_file_cached(self, path: str, purpose: str = "user_data") -> str:
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, purpose)
+        fid = self._upload_cache.get(key)
+        if fid is None:
+            fid = self._upload_cache[key] = self.upload_file(path, purpose=purpose)
+        return fid
+
     # --- MULTIMODAL GENERATE ---
     def generate(
         self,
@@ -75,11 +124,12 @@ class OpenAIClient:
         files: Optional[Iterable[Union[str, Dict[str, Any]]]] = None,  # paths or already-uploaded {"file_id": "..."}
         # responses API extras
         instructions: Optional[str] = None,  # alias for system
-        max_output_tokens: Optional[int] = 100000,
+        max_output_tokens: Optional[int] = 1024,
         temperature: Optional[float] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
         tool_choice: Optional[Union[str, Dict[str, Any]]] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        prompt_cache_key: Optional[str] = None,  # routes requests sharing a static prefix to the same prompt cache
         stream: bool = False,
         # NEW: control what gets inlined as text instead of uploaded
         inline_file_exts: Optional[set[str]] = None,   # defaults to {".md", ".log", ".txt"}
@@ -87,7 +137,7 @@ class OpenAIClient:
     ):
         """
         Build a Responses API request with text + images + files.
-        - images: local path/bytes/BytesIO/PIL -> data URL; image_urls: http(s) links
+        - images: local path/bytes/BytesIO/PIL -> data URL (paths over 64 KiB: uploaded once, sent by file_id); image_urls: http(s) links
         - files: local paths (auto-upload) or dicts with {"file_id": "..."} to be referenced
         - CEL.md (and any .md by default) are **inlined as text** (no upload) for maximal compatibility
         """
@@ -119,6 +169,10 @@ class OpenAIClient:
 
         if images:
             for img in images:
+                # Large local images go up once through the Files API instead of as a 4/3-size data URL
+                if isinstance(img, str) and os.path.getsize(img) > INLINE_IMAGE_MAX_BYTES:
+                    user_content.append({"type": "input_image", "file_id": self.upload_file_cached(img, purpose="vision")})
+                    continue
                 raw, mime = _read_bytes(img)
                 data_url = _to_data_url(raw, mime)
                 user_content.append({"type": "input_image", "image_url": {"url": data_url}})
@@ -135,15 +189,11 @@ class OpenAIClient:
                     raise TypeError("files[] must be paths or {'file_id': '...'}")
 
                 p = pathlib.Path(f)
-                ext = _ext(f)
+                ext = p.suffix.lower()  # reuse p rather than building a second Path in _ext()
 
                 # Inline as text for CEL.md or inline-able extensions
                 if p.name in inline_file_names or ext in inline_file_exts:
-                    try:
-                        content = p.read_text(encoding="utf-8", errors="ignore")
-                    except UnicodeDecodeError:
-                        # fallback to bytes → base64 in a text block
-                        content = p.read_bytes().decode("utf-8", errors="ignore")
+                    content = _read_inline_text(p)
                     # Make it obvious for the model what file this is
                     banner = f"BEGIN {p.name}\n{content}\nEND {p.name}"
                     user_content.append({"type": "input_text", "text": banner})
@@ -151,7 +201,7 @@ class OpenAIClient:
 
                 # Otherwise upload and reference as input_file
                 purpose = "vision" if ext in {".png", ".jpg", ".jpeg", ".webp"} else "user_data"
-                fid = self.upload_file(f, purpose=purpose)
+                fid = self.upload_file_cached(f, purpose=purpose)
                 user_content.append({"type": "input_file", "file_id": fid})
 
         # Only add user message if something is there
@@ -173,16 +223,17 @@ class OpenAIClient:
             kwargs["tool_choice"] = tool_choice
         if metadata is not None:
             kwargs["metadata"] = metadata
+        if prompt_cache_key is not None:
+            kwargs["prompt_cache_key"] = prompt_cache_key
 
         return self.client.responses.create(stream=True, **kwargs) if stream else self.client.responses.create(**kwargs)
 
     # Convenience: get plain text (handles Responses API shape)
     @staticmethod
     def output_text(response) -> str:
-        try:
-            return response.output_text  # some SDKs expose this directly
-        except Exception:
-            pass
+        text = getattr(response, "output_text", None)  # some SDKs expose this directly
+        if text is not None:
+            return text
         try:
             for out in response.output:  # fallback walk
                 if out.type == "message":
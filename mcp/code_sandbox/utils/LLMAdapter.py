@@ -1,4 +1,9 @@
-from typing import Any, Dict, Iterable, List, Optional, Union
+import collections
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Union
+
 from components.executor import LLMClient
 from services.openai_client import OpenAIClient
 
@@ -8,11 +13,12 @@ class LLMAdapter(LLMClient):
     You can pass extra multimodal context (images, files) per call.
     """
     def __init__(self, client: Optional[OpenAIClient]=None, *, model: str="gpt-4.1-mini",
-                 temperature: float=0.2, system: Optional[str]=None):
+                 temperature: float=0.2, system: Optional[str]=None, prompt_cache_key: Optional[str]=None):
         self.oai = client or OpenAIClient()
         self.model = model
         self.temperature = temperature
         self.system = system or "Be concise and correct. Output only what is asked."
+        self.prompt_cache_key = prompt_cache_key
 
     def generate(
         self, 
@@ -32,5 +38,42 @@ class LLMAdapter(LLMClient):
             image_urls=image_urls,
             temperature=self.temperature, 
             max_output_tokens=max_output_tokens,
+            prompt_cache_key=self.prompt_cache_key,
         )
-        return self.oai.output_text(resp) or ""
\ No newline at end of file
+        return self.oai.output_text(resp) or ""
+
+
+class CachingLLMAdapter(LLMClient):
+    """
+    Exact-prompt response cache in front of an LLMAdapter: a text-only prompt identical
+    (sha256) to one answered in the last `ttl_s` seconds gets that answer back instead of a new
+    generation. The cache belongs to one adapter, so model, system prompt and temperature are
+    fixed for every entry. Meant for judges such as the evaluator, whose answer can hinge on one
+    traceback line; keep it off code writers, whose code must match the live kernel state.
+    """
+    def __init__(self, inner: LLMAdapter, *, ttl_s: float=3600.0, max_entries: int=256):
+        self.inner = inner
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # sha256(prompt) -> (created_at, response text), oldest first
+        self._entries: "collections.OrderedDict[str, tuple[float, str]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        # Attachments aren't part of the key, so those calls always go upstream.
+        if any(kwargs.get(k) for k in ("files", "images", "image_urls")):
+            return self.inner.generate(prompt, **kwargs)
+        key = hashlib.sha256(prompt.encode("utf-8", "surrogatepass")).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and now - hit[0] < self.ttl_s:
+                return hit[1]
+        out = self.inner.generate(prompt, **kwargs)
+        if out:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), out)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return out